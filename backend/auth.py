@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+import time
+import bcrypt
+import jwt as pyjwt
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, Depends, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from mysql.connector import Error
+from dotenv import load_dotenv
+from cache import TTLCache
+from db import UnitOfWork, get_db, run_db
+
+load_dotenv()
+
+
+SECRET_KEY = os.getenv('SECRET_KEY')
+ALGORITHM = "HS256"
+
+security = HTTPBearer()
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))
+
+# Resolved users keyed by token subject (email). Per process, so the TTL
+# bounds how long another worker can serve a stale profile after a change.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', min(4, os.cpu_count() or 1)))
+BCRYPT_MAX_QUEUE = int(os.getenv('BCRYPT_MAX_QUEUE', 32))
+
+# bcrypt releases the GIL while hashing, so a thread pool gives real parallelism
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_stats_lock = threading.Lock()
+_pending = 0
+_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "queue_wait_total": 0.0,
+    "queue_wait_max": 0.0,
+    "hash_time_total": 0.0,
+    "hash_time_max": 0.0,
+}
+
+
+def hash_password(password: str) -> str:
+
+    salt = bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+def verify_password(password: str, hashed_password: str) -> bool:
+
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def _timed(func, args, submitted_at):
+    started = time.monotonic()
+    try:
+        return func(*args)
+    finally:
+        finished = time.monotonic()
+        waited = started - submitted_at
+        took = finished - started
+        with _stats_lock:
+            _stats["completed"] += 1
+            _stats["queue_wait_total"] += waited
+            _stats["queue_wait_max"] = max(_stats["queue_wait_max"], waited)
+            _stats["hash_time_total"] += took
+            _stats["hash_time_max"] = max(_stats["hash_time_max"], took)
+
+async def run_bcrypt(func, *args):
+    """Run hash_password/verify_password on the bcrypt pool, rejecting with 503 when saturated"""
+    global _pending
+    with _stats_lock:
+        if _pending >= BCRYPT_WORKERS + BCRYPT_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_executor, _timed, func, args, time.monotonic())
+    finally:
+        with _stats_lock:
+            _pending -= 1
+
+def get_bcrypt_stats():
+    with _stats_lock:
+        completed = _stats["completed"]
+        return {
+            "workers": BCRYPT_WORKERS,
+            "max_queue": BCRYPT_MAX_QUEUE,
+            "pending": _pending,
+            "completed": completed,
+            "rejected": _stats["rejected"],
+            "avg_queue_wait_ms": round(_stats["queue_wait_total"] / completed * 1000, 3) if completed else 0.0,
+            "max_queue_wait_ms": round(_stats["queue_wait_max"] * 1000, 3),
+            "avg_hash_time_ms": round(_stats["hash_time_total"] / completed * 1000, 3) if completed else 0.0,
+            "max_hash_time_ms": round(_stats["hash_time_max"] * 1000, 3),
+        }
+
+
+def get_active_user_by_email(db: UnitOfWork, email: str):
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, email, name, created_at, is_active 
+            FROM users 
+            WHERE email = %s AND is_active = TRUE
+        """, (email,))
+        user = cursor.fetchone()
+        cursor.close()
+
+        if user and user.get('created_at'):
+            user['created_at'] = str(user['created_at'])
+
+        return user
+    except Error as e:
+        print(f"Error getting user: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to get user information"
+        )
+
+def invalidate_user(email: str):
+    """Drop a cached user after its row was changed or deleted"""
+    user_cache.invalidate(email)
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: UnitOfWork = Depends(get_db)
+):
+    """Get current user from JWT token"""
+    token = credentials.credentials
+    try:
+        payload = pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str = payload.get("sub")
+        if email is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    except pyjwt.PyJWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = user_cache.get(email)
+    if user is None:
+        user = await run_db(get_active_user_by_email, db, email)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user_cache.set(email, user)
+    return dict(user)
+
+def get_user_cache_stats():
+    return user_cache.stats()
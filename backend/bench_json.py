@@ -0,0 +1,81 @@
+"""Serialization benchmark for list responses: python bench_json.py [--rows 50] [--seconds 2]
+
+Compares FastAPI's default path (jsonable_encoder, then JSONResponse) with
+FastJSONResponse on orjson and on its stdlib fallback, over a synthetic
+/api/listings page shaped like LISTING_SELECT rows. No database needed.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import fast_json
+from fast_json import FastJSONResponse
+
+
+def listing_page(rows):
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    listings = [{
+        "id": i,
+        "title": f"Second-hand item {i}",
+        "description": "Gently used, works perfectly, pickup only. " * 12,
+        "price": Decimal("1299.50") + i,
+        "category": "Electronics",
+        "condition_type": "used",
+        "location": "Bengaluru",
+        "images": [f"https://img.example.com/{i}/{n}.jpg" for n in range(4)],
+        "primary_image": f"https://img.example.com/{i}/0.jpg",
+        "status": "active",
+        "views": i * 7,
+        "created_at": now - timedelta(minutes=i),
+        "updated_at": now,
+        "seller_name": "Seller",
+        "seller_email": "seller@example.com",
+    } for i in range(rows)]
+    return {"listings": listings, "total": 10000, "total_approximate": False,
+            "limit": rows, "offset": 0, "next_cursor": None}
+
+
+def measure(render, payload, seconds):
+    size = len(render(payload))
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        render(payload)
+        calls += 1
+    elapsed = time.perf_counter() - start
+    return size, calls / elapsed, size * calls / elapsed / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    payload = listing_page(args.rows)
+    orjson = fast_json.orjson
+    candidates = [("jsonable_encoder + JSONResponse", lambda p: JSONResponse(jsonable_encoder(p)).body)]
+    if orjson is not None:
+        candidates.append(("FastJSONResponse (orjson)", lambda p: FastJSONResponse(p).body))
+
+    def stdlib(p):
+        fast_json.orjson = None
+        try:
+            return FastJSONResponse(p).body
+        finally:
+            fast_json.orjson = orjson
+    candidates.append(("FastJSONResponse (json module)", stdlib))
+
+    print(f"{args.rows} listings per response")
+    baseline = None
+    for name, render in candidates:
+        size, per_second, mb_per_second = measure(render, payload, args.seconds)
+        baseline = baseline or per_second
+        print(f"{name:34} {size:8d} B  {per_second:9.0f} resp/s  {mb_per_second:8.1f} MB/s  "
+              f"{per_second / baseline:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds
+
+    With maxbytes set, sizeof(value) (len by default) of every entry also counts
+    against a byte budget, for caches holding serialized payloads of very
+    different sizes.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, maxbytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._discard(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _weight(self, value):
+        return self.sizeof(value) if self.maxbytes is not None else 0
+
+    def _discard(self, key):
+        value, _ = self._data.pop(key)
+        self.bytes -= self._weight(value)
+
+    def set(self, key, value, ttl=None):
+        if self.maxbytes is not None and self._weight(value) > self.maxbytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = (value, expires_at)
+            self.bytes += self._weight(value)
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                self._discard(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key satisfies predicate(key)"""
+        with self._lock:
+            doomed = [key for key in self._data if predicate(key)]
+            for key in doomed:
+                self._discard(key)
+            self.invalidations += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+            if self.maxbytes is not None:
+                stats["bytes"] = self.bytes
+                stats["maxbytes"] = self.maxbytes
+            return stats
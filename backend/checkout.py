@@ -1,95 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
 import os
-import jwt as pyjwt
 from dotenv import load_dotenv
+from db import UnitOfWork, get_db, get_db_connection, run_db
+from auth import get_current_user
+from fast_json import FastJSONResponse
 
 load_dotenv()
 
 router = APIRouter()
 
 
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': int(os.getenv('DB_PORT', 3306)),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'ecofinds_db'),
-    'charset': 'utf8mb4',
-    'autocommit': True
-}
-
-SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
-ALGORITHM = "HS256"
-security = HTTPBearer()
-
-def get_db_connection():
-    """Get database connection"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Database connection failed"
-        )
-
-def get_user_by_email(email: str):
-    """Get user by email"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, email, password_hash, name, created_at, is_active 
-            FROM users 
-            WHERE email = %s AND is_active = TRUE
-        """, (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if user and user.get('created_at'):
-            user['created_at'] = str(user['created_at'])
-            
-        return user
-    except Error as e:
-        print(f"Error getting user by email: {e}")
-        return None
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current user from JWT token"""
-    token = credentials.credentials
-    try:
-        payload = pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    except pyjwt.PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_email(email)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
-
 def init_checkout_tables():
     """Initialize checkout-related database tables"""
     try:
@@ -185,16 +110,22 @@ def generate_order_number():
     return f"ORD-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
 
 
-@router.post("/api/checkout", response_model=OrderResponse)
-async def process_checkout(
-    checkout_data: CheckoutRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    """Process checkout and create order"""
-    
+ORDER_ITEM_INSERT = """
+            INSERT INTO order_items (order_id, listing_id, quantity, unit_price, total_price)
+            VALUES """
+ORDER_ITEM_INSERT_ROW = "(%s, %s, %s, %s, %s)"
+
+
+def _process_checkout(db: UnitOfWork, checkout_data: CheckoutRequest, current_user: dict):
+    """Order, its items and the cart clear-out as one transaction: all of it lands or none does
+
+    The UnitOfWork runs with autocommit off, so nothing before db.commit() is
+    durable and a failed statement rolls the order back with it.
+    """
+    if not checkout_data.order_items:
+        raise HTTPException(status_code=400, detail="Order has no items")
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         total_amount = sum(item.price * item.quantity for item in checkout_data.order_items)
@@ -217,25 +148,18 @@ async def process_checkout(
         order_id = cursor.lastrowid
         
         
-        for item in checkout_data.order_items:
-            total_price = item.price * item.quantity
-            cursor.execute("""
-                INSERT INTO order_items (order_id, listing_id, quantity, unit_price, total_price)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                order_id,
-                item.product_id,
-                item.quantity,
-                item.price,
-                total_price
-            ))
+        # One multi-row INSERT for all lines; the whole order commits once below
+        cursor.execute(ORDER_ITEM_INSERT + ", ".join([ORDER_ITEM_INSERT_ROW] * len(checkout_data.order_items)), [
+            value
+            for item in checkout_data.order_items
+            for value in (order_id, item.product_id, item.quantity, item.price, item.price * item.quantity)
+        ])
         
         
         cursor.execute("DELETE FROM cart_items WHERE user_id = %s", (current_user["id"],))
         
-        conn.commit()
+        db.commit()
         cursor.close()
-        conn.close()
         
         return OrderResponse(
             order_id=order_id,
@@ -245,20 +169,36 @@ async def process_checkout(
             message="Order placed successfully!"
         )
         
+    except mysql.connector.IntegrityError as e:
+        db.rollback()
+        if e.errno == 1452:  # foreign key: no such listing
+            raise HTTPException(status_code=400, detail="One or more listings do not exist")
+        print(f"Error processing checkout: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to process checkout"
+        )
     except Error as e:
+        db.rollback()
         print(f"Error processing checkout: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to process checkout"
         )
 
-@router.get("/api/orders")
-async def get_user_orders(current_user: dict = Depends(get_current_user)):
-    """Get user's order history"""
-    
+
+@router.post("/api/checkout", response_model=OrderResponse)
+async def process_checkout(
+    checkout_data: CheckoutRequest,
+    current_user: dict = Depends(get_current_user),
+    db: UnitOfWork = Depends(get_db)
+):
+    """Process checkout and create order"""
+    return await run_db(_process_checkout, db, checkout_data, current_user)
+
+def _get_user_orders(db: UnitOfWork, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
         cursor.execute("""
             SELECT o.id, o.order_number, o.status, o.total_amount, o.created_at,
@@ -282,7 +222,6 @@ async def get_user_orders(current_user: dict = Depends(get_current_user)):
                 order['payment_info'] = json.loads(order['payment_info'])
         
         cursor.close()
-        conn.close()
         
         return {"orders": orders}
         
@@ -293,16 +232,15 @@ async def get_user_orders(current_user: dict = Depends(get_current_user)):
             detail="Failed to fetch orders"
         )
 
-@router.get("/api/orders/{order_id}")
-async def get_order_details(
-    order_id: int,
-    current_user: dict = Depends(get_current_user)
-):
-    """Get detailed information about a specific order"""
-    
+
+@router.get("/api/orders")
+async def get_user_orders(current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Get user's order history"""
+    return FastJSONResponse(await run_db(_get_user_orders, db, current_user))
+
+def _get_order_details(db: UnitOfWork, order_id: int, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
         
         cursor.execute("""
@@ -323,7 +261,7 @@ async def get_order_details(
         
         cursor.execute("""
             SELECT oi.id, oi.listing_id, oi.quantity, oi.unit_price, oi.total_price,
-                   l.title, l.images, u.name as seller_name
+                   l.title, l.primary_image, u.name as seller_name
             FROM order_items oi
             LEFT JOIN listings l ON oi.listing_id = l.id
             LEFT JOIN users u ON l.user_id = u.id
@@ -336,15 +274,6 @@ async def get_order_details(
         order_items = []
         for item in items:
             
-            image = None
-            if item.get('images'):
-                try:
-                    images = item['images'] if isinstance(item['images'], list) else eval(item['images'])
-                    if images and len(images) > 0:
-                        image = images[0]
-                except:
-                    pass
-            
             order_items.append({
                 "id": item['id'],
                 "listing_id": item['listing_id'],
@@ -352,7 +281,7 @@ async def get_order_details(
                 "unit_price": float(item['unit_price']),
                 "total_price": float(item['total_price']),
                 "title": item['title'] or "Unknown Product",
-                "image": image,
+                "image": item['primary_image'],
                 "seller_name": item['seller_name'] or "Unknown Seller"
             })
         
@@ -369,7 +298,6 @@ async def get_order_details(
         order['items'] = order_items
         
         cursor.close()
-        conn.close()
         
         return order
         
@@ -380,14 +308,17 @@ async def get_order_details(
             detail="Failed to fetch order details"
         )
 
-@router.put("/api/orders/{order_id}/status")
-async def update_order_status(
+
+@router.get("/api/orders/{order_id}")
+async def get_order_details(
     order_id: int,
-    status: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: UnitOfWork = Depends(get_db)
 ):
-    """Update order status (admin only in real implementation)"""
-    
+    """Get detailed information about a specific order"""
+    return await run_db(_get_order_details, db, order_id, current_user)
+
+def _update_order_status(db: UnitOfWork, order_id: int, status: str, current_user: dict):
     valid_statuses = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
     if status not in valid_statuses:
         raise HTTPException(
@@ -396,8 +327,7 @@ async def update_order_status(
         )
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         cursor.execute("""
@@ -418,9 +348,8 @@ async def update_order_status(
             WHERE id = %s
         """, (status, order_id))
         
-        conn.commit()
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {"message": f"Order status updated to {status}"}
         
@@ -430,3 +359,14 @@ async def update_order_status(
             status_code=500,
             detail="Failed to update order status"
         )
+
+
+@router.put("/api/orders/{order_id}/status")
+async def update_order_status(
+    order_id: int,
+    status: str,
+    current_user: dict = Depends(get_current_user),
+    db: UnitOfWork = Depends(get_db)
+):
+    """Update order status (admin only in real implementation)"""
+    return await run_db(_update_order_status, db, order_id, status, current_user)
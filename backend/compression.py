@@ -0,0 +1,151 @@
+import asyncio
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip is offered
+    brotli = None
+
+
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+# Bodies at least this big are compressed on a worker thread instead of the event loop
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv('COMPRESSION_OFFLOAD_SIZE', 64 * 1024))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/', 'application/javascript',
+                      'application/xml')
+
+
+def _accepted_encodings(header):
+    """Codings from an Accept-Encoding header that are not refused with q=0"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _choose_encoding(headers):
+    accepted = _accepted_encodings(headers.get(b'accept-encoding', b'').decode('latin-1'))
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _weak_etag(value):
+    # Same entity, different bytes: a strong validator would claim byte equality
+    return value if value.startswith(b'W/') else b'W/' + value
+
+
+def _compress(body, encoding, gzip_level, brotli_quality):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware that gzip/brotli-compresses large single-body responses
+
+    Responses below min_size, already encoded, of non-text types, or
+    streamed in several chunks (exports, file downloads) pass through
+    untouched. Bodies of offload_size or more are compressed on a worker
+    thread so a big page does not stall the event loop. Compressed bodies
+    get a weak ETag, and a 304 answering that weak tag repeats it rather
+    than the strong tag the app produced.
+    """
+
+    def __init__(self, app, min_size=COMPRESSION_MIN_SIZE, gzip_level=COMPRESSION_GZIP_LEVEL,
+                 brotli_quality=COMPRESSION_BROTLI_QUALITY, offload_size=COMPRESSION_OFFLOAD_SIZE):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope['headers'])
+        encoding = _choose_encoding(request_headers)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+
+            body = message.get('body', b'')
+            if start['status'] == 304:
+                start = self._revalidated_start(start, request_headers.get(b'if-none-match', b''))
+            if message.get('more_body', False) or not self._should_compress(start, body):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= self.offload_size:
+                compressed = await asyncio.to_thread(_compress, body, encoding, self.gzip_level, self.brotli_quality)
+            else:
+                compressed = _compress(body, encoding, self.gzip_level, self.brotli_quality)
+            await send(self._compressed_start(start, encoding, len(compressed)))
+            await send({'type': 'http.response.body', 'body': compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(self, start, body):
+        if len(body) < self.min_size or start['status'] in (204, 304):
+            return False
+        headers = dict(start['headers'])
+        if b'content-encoding' in headers:
+            return False
+        content_type = headers.get(b'content-type', b'').decode('latin-1')
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _revalidated_start(self, start, if_none_match):
+        # A 304 for a page that went out compressed repeats the weak validator the client holds
+        headers = []
+        for name, value in start['headers']:
+            if name == b'etag' and _weak_etag(value) in if_none_match:
+                value = _weak_etag(value)
+            headers.append((name, value))
+        return {**start, 'headers': headers}
+
+    def _compressed_start(self, start, encoding, length):
+        headers = []
+        vary = None
+        for name, value in start['headers']:
+            if name == b'content-length':
+                continue
+            if name == b'vary':
+                vary = value
+                continue
+            if name == b'etag':
+                value = _weak_etag(value)
+            headers.append((name, value))
+        headers.append((b'content-encoding', encoding.encode('latin-1')))
+        headers.append((b'content-length', str(length).encode('latin-1')))
+        headers.append((b'vary', vary + b', Accept-Encoding' if vary else b'Accept-Encoding'))
+        return {**start, 'headers': headers}
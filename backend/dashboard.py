@@ -1,88 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
+import asyncio
+import json
 import os
+import re
+import threading
+import time
 from typing import List, Optional
 from dotenv import load_dotenv
+from db import UnitOfWork, ensure_column, ensure_index, get_db, get_db_connection, run_db
+from auth import get_current_user, invalidate_user
+from search_index import listing_index, listing_trigrams
+from cache import TTLCache
+from facets import listing_facets
+from suggest import listing_suggester
+from views import listing_views
+from listing_import import IMPORT_FORMATS, RowParser, aiter_lines, validation_message
+from export import stream_export
+from etag import body_etag, etag_matches, not_modified
+from fast_json import FastJSONResponse
+from pagination import MAX_PAGE_SIZE, fetch_page, keyset_condition, paginate
 
 load_dotenv()
 
 router = APIRouter()
-security = HTTPBearer()
-
-
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': int(os.getenv('DB_PORT', 3306)),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', ''),
-    'charset': 'utf8mb4',
-    'autocommit': True
-}
-
-def get_db_connection():
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Database connection failed"
-        )
-
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    import jwt as pyjwt
-    SECRET_KEY = os.getenv('SECRET_KEY', '')
-    ALGORITHM = "HS256"
-    
-    token = credentials.credentials
-    try:
-        payload = pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    except pyjwt.PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-   
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, email, name, created_at, is_active 
-            FROM users 
-            WHERE email = %s AND is_active = TRUE
-        """, (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return user
-    except Error as e:
-        print(f"Error getting user: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to get user information"
-        )
 
 
 class ListingCreate(BaseModel):
@@ -122,6 +66,55 @@ class ReviewCreate(BaseModel):
     comment: str
 
 
+# Indexes on existing tables are added by `python manage.py migrate`, not at import: building
+# them on a large listings table takes minutes and every worker would race to do it
+DASHBOARD_INDEXES = (
+    ('listings', 'ft_listings_search', 'FULLTEXT INDEX ft_listings_search (title, description, location)'),
+    # One index per supported (category filter?, sort) pair so the shop never filesorts;
+    # price range and condition then only narrow the scanned range or filter rows
+    ('listings', 'idx_listings_status_created', 'INDEX idx_listings_status_created (status, created_at, id)'),
+    ('listings', 'idx_listings_status_category_created',
+     'INDEX idx_listings_status_category_created (status, category, created_at, id)'),
+    ('listings', 'idx_listings_status_price', 'INDEX idx_listings_status_price (status, price, id)'),
+    ('listings', 'idx_listings_status_category_price',
+     'INDEX idx_listings_status_category_price (status, category, price, id)'),
+    ('listings', 'idx_listings_status_views', 'INDEX idx_listings_status_views (status, views, id)'),
+    ('listings', 'idx_listings_status_category_views',
+     'INDEX idx_listings_status_category_views (status, category, views, id)'),
+    ('messages', 'idx_messages_recipient_created',
+     'INDEX idx_messages_recipient_created (recipient_id, created_at, id)'),
+    ('messages', 'idx_messages_sender_created', 'INDEX idx_messages_sender_created (sender_id, created_at, id)'),
+    ('orders', 'idx_orders_buyer_created', 'INDEX idx_orders_buyer_created (buyer_id, created_at, id)'),
+    ('orders', 'idx_orders_seller_created', 'INDEX idx_orders_seller_created (seller_id, created_at, id)'),
+    ('reviews', 'idx_reviews_reviewee_created',
+     'INDEX idx_reviews_reviewee_created (reviewee_id, created_at, id)'),
+    ('reviews', 'idx_reviews_reviewer_created',
+     'INDEX idx_reviews_reviewer_created (reviewer_id, created_at, id)'),
+)
+
+def _missing_dashboard_indexes(cursor):
+    cursor.execute("""
+        SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    existing = set(cursor.fetchall())
+    return [name for table, name, _ in DASHBOARD_INDEXES if (table, name) not in existing]
+
+def migrate_dashboard_indexes():
+    """Create any missing DASHBOARD_INDEXES; returns the names added"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    added = []
+    try:
+        for table, name, definition in DASHBOARD_INDEXES:
+            if ensure_index(cursor, table, name, definition):
+                added.append(name)
+                print(f"Added index {table}.{name}")
+    finally:
+        cursor.close()
+        conn.close()
+    return added
+
 def init_dashboard_tables():
     try:
         conn = get_db_connection()
@@ -139,15 +132,19 @@ def init_dashboard_tables():
                 `condition` VARCHAR(50) NOT NULL,
                 location VARCHAR(255) NOT NULL,
                 images JSON,
+                primary_image MEDIUMTEXT NULL,
                 is_active BOOLEAN DEFAULT TRUE,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
                 INDEX idx_listings_user_id (user_id),
                 INDEX idx_listings_category (category),
-                INDEX idx_listings_price (price)
+                INDEX idx_listings_price (price),
+                FULLTEXT INDEX ft_listings_search (title, description, location)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         ''')
+        # First entry of images, denormalized so cart/order/listing reads need not parse the array
+        ensure_column(cursor, 'listings', 'primary_image', 'primary_image MEDIUMTEXT NULL')
         
         
         cursor.execute('''
@@ -211,6 +208,10 @@ def init_dashboard_tables():
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         ''')
         
+        missing = _missing_dashboard_indexes(cursor)
+        if missing:
+            print(f"Warning: missing indexes {', '.join(missing)}; run 'python manage.py migrate'")
+        
         conn.commit()
         cursor.close()
         conn.close()
@@ -223,126 +224,830 @@ def init_dashboard_tables():
 init_dashboard_tables()
 
 
-@router.get("/api/listings", response_model=dict)
-async def get_all_listings(category: str = None, search: str = None, limit: int = 50, offset: int = 0):
-    """Get all active listings for the shop page"""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        
-        query = """
+LISTINGS_SEARCH_MODE = os.getenv('LISTINGS_SEARCH_MODE', 'fulltext')
+LISTINGS_SEARCH_INDEX = os.getenv('LISTINGS_SEARCH_INDEX', 'false').lower() in ('1', 'true', 'yes')
+LISTINGS_FUZZY_SEARCH = os.getenv('LISTINGS_FUZZY_SEARCH', 'false').lower() in ('1', 'true', 'yes')
+SEARCH_MODES = ('fulltext', 'boolean', 'like', 'index', 'fuzzy')
+LISTING_SORTS = {
+    'newest': "l.created_at DESC, l.id DESC",
+    'price_asc': "l.price ASC, l.id ASC",
+    'price_desc': "l.price DESC, l.id DESC",
+    'most_viewed': "l.views DESC, l.id DESC",
+}
+FULLTEXT_MATCH = "MATCH(l.title, l.description, l.location) AGAINST (%s IN {} MODE)"
+
+LISTINGS_COUNT_MODE = os.getenv('LISTINGS_COUNT_MODE', 'cached')
+LISTINGS_COUNT_CACHE_TTL = float(os.getenv('LISTINGS_COUNT_CACHE_TTL', 30))
+COUNT_MODES = ('exact', 'cached', 'approximate', 'none')
+
+# Exact totals keyed by (category, search, search_mode, min_price, max_price, condition); None means "any"
+listing_count_cache = TTLCache(maxsize=4096, ttl=LISTINGS_COUNT_CACHE_TTL)
+
+LISTINGS_RESPONSE_CACHE_TTL = float(os.getenv('LISTINGS_RESPONSE_CACHE_TTL', 10))
+LISTINGS_RESPONSE_CACHE_BYTES = int(os.getenv('LISTINGS_RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))
+
+# Serialized /api/listings bodies keyed by normalized query params, category first.
+# The TTL bounds staleness from writes made by other worker processes.
+listing_response_cache = TTLCache(maxsize=10000, ttl=LISTINGS_RESPONSE_CACHE_TTL,
+                                  maxbytes=LISTINGS_RESPONSE_CACHE_BYTES, sizeof=lambda entry: len(entry[0]))
+# Bumped on every invalidation so a read that raced a write never stores its stale page
+_listing_cache_generation = 0
+_generation_lock = threading.Lock()
+
+LISTINGS_SUGGEST = os.getenv('LISTINGS_SUGGEST', 'true').lower() in ('1', 'true', 'yes')
+
+LISTINGS_IMPORT_CHUNK = int(os.getenv('LISTINGS_IMPORT_CHUNK', 1000))
+LISTINGS_IMPORT_MAX_ERRORS = int(os.getenv('LISTINGS_IMPORT_MAX_ERRORS', 100))
+
+LISTING_FACETS_RESYNC = float(os.getenv('LISTING_FACETS_RESYNC', 300))
+# The in-memory search indexes and suggester pick up listings written by other workers (or
+# manage.py import-listings) by polling updated_at every LISTINGS_INDEX_CATCHUP seconds;
+# deletions made elsewhere only leave them with the full rebuild every LISTINGS_INDEX_REBUILD
+LISTINGS_INDEX_CATCHUP = float(os.getenv('LISTINGS_INDEX_CATCHUP', 30))
+LISTINGS_INDEX_REBUILD = float(os.getenv('LISTINGS_INDEX_REBUILD', 3600))
+
+LISTING_VIEWS_FLUSH_INTERVAL = float(os.getenv('LISTING_VIEWS_FLUSH_INTERVAL', 5))
+LISTING_VIEWS_FLUSH_BATCH = int(os.getenv('LISTING_VIEWS_FLUSH_BATCH', 500))
+
+# No primary_image: images already carries it, and images are data URLs, so it would be sent
+# twice. Clients that only want the cover ask for it through fields= (e.g. fields=card).
+LISTING_SELECT = """
             SELECT l.id, l.title, l.description, l.price, l.category, l.condition_type, 
                    l.location, l.images, l.status, l.views, l.created_at, l.updated_at,
                    u.name as seller_name, u.email as seller_email
+"""
+
+# Selectable listing fields for fields=; id and created_at are always returned (cursor paging needs them)
+LISTING_FIELDS = {
+    'id': "l.id",
+    'title': "l.title",
+    'description': "l.description",
+    'price': "l.price",
+    'category': "l.category",
+    'condition_type': "l.condition_type",
+    'location': "l.location",
+    'images': "l.images",
+    'primary_image': "l.primary_image",
+    'status': "l.status",
+    'views': "l.views",
+    'created_at': "l.created_at",
+    'updated_at': "l.updated_at",
+    'seller_name': "u.name as seller_name",
+    'seller_email': "u.email as seller_email",
+}
+LISTING_PROJECTIONS = {
+    # What a shop grid card shows
+    'card': ('title', 'price', 'primary_image', 'location', 'category', 'condition_type'),
+}
+
+
+def _load_listing_indexes():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, title, description, category, location
+        FROM listings
+        WHERE status = 'active'
+    """)
+    listing_index.rebuild(cursor)
+    cursor.close()
+    conn.close()
+    print(f"Listing search index built: {listing_index.stats()}")
+
+def _load_listing_trigrams():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, title, category
+        FROM listings
+        WHERE status = 'active'
+    """)
+    listing_trigrams.rebuild(cursor)
+    cursor.close()
+    conn.close()
+    print(f"Listing trigram index built: {listing_trigrams.stats()}")
+
+def _load_listing_suggestions():
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT id, title, category, views, created_at
+        FROM listings
+        WHERE status = 'active'
+    """)
+    listing_suggester.rebuild(cursor)
+    cursor.close()
+    conn.close()
+
+_listing_index_watermark = None
+
+def _in_memory_listing_indexes():
+    return LISTINGS_SEARCH_INDEX or LISTINGS_FUZZY_SEARCH or LISTINGS_SUGGEST
+
+def _rebuild_listing_indexes():
+    """Reload the enabled in-memory indexes from MySQL and remember how far they are in sync"""
+    global _listing_index_watermark
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(updated_at) FROM listings")
+    row = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    if LISTINGS_SEARCH_INDEX:
+        _load_listing_indexes()
+    if LISTINGS_FUZZY_SEARCH:
+        _load_listing_trigrams()
+    if LISTINGS_SUGGEST:
+        _load_listing_suggestions()
+    _listing_index_watermark = row[0] if row else None
+
+def _catch_up_listing_indexes():
+    """Apply listings changed since the last sync, e.g. by other workers; returns rows applied
+
+    Rows updated in the watermark's own second are read again next time,
+    since updated_at only has one-second resolution; re-applying is harmless.
+    """
+    global _listing_index_watermark
+    if _listing_index_watermark is None:
+        _rebuild_listing_indexes()
+        return 0
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(LISTING_INDEX_SELECT + " WHERE updated_at >= %s", (_listing_index_watermark,))
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    if rows:
+        _invalidate_listing_caches({row['category'] for row in rows})
+        for row in rows:
+            _apply_to_listing_indexes(row['id'], row if row['status'] == 'active' else None)
+        _listing_index_watermark = max(row['updated_at'] for row in rows)
+    return len(rows)
+
+async def _sync_listing_indexes():
+    last_rebuild = time.monotonic()
+    while True:
+        await asyncio.sleep(LISTINGS_INDEX_CATCHUP)
+        try:
+            if LISTINGS_INDEX_REBUILD > 0 and time.monotonic() - last_rebuild >= LISTINGS_INDEX_REBUILD:
+                await run_db(_rebuild_listing_indexes)
+                last_rebuild = time.monotonic()
+            else:
+                await run_db(_catch_up_listing_indexes)
+        except Exception as e:
+            print(f"Error syncing listing indexes: {e}")
+
+def _load_listing_facets():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT category, condition_type, COUNT(*)
+        FROM listings
+        WHERE status = 'active'
+        GROUP BY category, condition_type
+    """)
+    listing_facets.rebuild(cursor.fetchall())
+    cursor.close()
+    conn.close()
+
+def _load_viewable_listings():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM listings WHERE status = 'active'")
+    listing_views.set_listings(row[0] for row in cursor.fetchall())
+    cursor.close()
+    conn.close()
+
+async def _resync_listing_facets():
+    # Also picks up listings created or deleted through other worker processes
+    while True:
+        await asyncio.sleep(LISTING_FACETS_RESYNC)
+        try:
+            await run_db(_load_listing_facets)
+            await run_db(_load_viewable_listings)
+        except Exception as e:
+            print(f"Error resyncing listing facets: {e}")
+
+def _flush_listing_views():
+    """Apply buffered view deltas in one transaction of batched CASE updates"""
+    deltas = listing_views.drain()
+    if not deltas:
+        return 0
+    # Ascending id order so concurrent flushers from other workers lock rows in the same order
+    ids = sorted(deltas)
+    conn = None
+    try:
+        conn = get_db_connection()
+        conn.start_transaction()
+        cursor = conn.cursor()
+        for start in range(0, len(ids), LISTING_VIEWS_FLUSH_BATCH):
+            chunk = ids[start:start + LISTING_VIEWS_FLUSH_BATCH]
+            cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            placeholders = ", ".join(["%s"] * len(chunk))
+            params = [value for listing_id in chunk for value in (listing_id, deltas[listing_id])]
+            cursor.execute(f"""
+                UPDATE listings
+                SET views = views + CASE id {cases} ELSE 0 END, updated_at = updated_at
+                WHERE id IN ({placeholders})
+            """, params + chunk)
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        print(f"Error flushing listing views: {e}")
+        listing_views.restore(deltas)
+        return 0
+    finally:
+        if conn:
+            conn.close()
+    listing_views.mark_flushed(deltas)
+    return len(ids)
+
+async def _flush_listing_views_periodically():
+    while True:
+        await asyncio.sleep(LISTING_VIEWS_FLUSH_INTERVAL)
+        await run_db(_flush_listing_views)
+
+_background_tasks = set()
+
+@router.on_event("startup")
+async def build_listing_indexes():
+    await run_db(_load_listing_facets)
+    await run_db(_load_viewable_listings)
+    if LISTING_FACETS_RESYNC > 0:
+        task = asyncio.create_task(_resync_listing_facets())
+        _background_tasks.add(task)
+    if LISTING_VIEWS_FLUSH_INTERVAL > 0:
+        task = asyncio.create_task(_flush_listing_views_periodically())
+        _background_tasks.add(task)
+    if _in_memory_listing_indexes():
+        await run_db(_rebuild_listing_indexes)
+        if LISTINGS_INDEX_CATCHUP > 0:
+            task = asyncio.create_task(_sync_listing_indexes())
+            _background_tasks.add(task)
+
+@router.on_event("shutdown")
+async def flush_pending_views():
+    for task in _background_tasks:
+        task.cancel()
+    await run_db(_flush_listing_views)
+
+def _invalidate_listing_caches(categories=None):
+    """Drop cached counts and pages that can include listings of these categories (all when None)"""
+    global _listing_cache_generation
+    with _generation_lock:
+        _listing_cache_generation += 1
+    if categories is None:
+        listing_count_cache.clear()
+        listing_response_cache.clear()
+        return
+    affected = lambda key: key[0] is None or key[0] in categories
+    listing_count_cache.invalidate_where(affected)
+    listing_response_cache.invalidate_where(affected)
+
+def _listing_before_write(row):
+    """The ownership-check row (user_id, category, condition_type, status) as a before-image"""
+    return {"category": row[1], "condition_type": row[2], "status": row[3]}
+
+LISTING_INDEX_SELECT = """
+            SELECT id, title, description, category, condition_type, location, status, views, created_at,
+                   updated_at
+            FROM listings
+"""
+
+def _after_listing_write(db: UnitOfWork, listing_id: int, before: Optional[dict] = None):
+    """Bring in-process listing caches, facets and indexes up to date after a committed listing write
+
+    before: the listing's category/condition_type/status ahead of the write (None on create).
+    """
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(LISTING_INDEX_SELECT + " WHERE id = %s", (listing_id,))
+        after = cursor.fetchone()
+        cursor.close()
+    except Error as e:
+        print(f"Error refreshing listing indexes: {e}")
+        _invalidate_listing_caches()
+        return
+    
+    _invalidate_listing_caches({row['category'] for row in (before, after) if row})
+    _apply_listing_change(listing_id, before, after)
+
+def _after_listing_bulk_insert(db: UnitOfWork, listing_ids: list):
+    """_after_listing_write for a batch of freshly inserted listings, re-read with one query"""
+    if not listing_ids:
+        return
+    try:
+        cursor = db.cursor(dictionary=True)
+        placeholders = ", ".join(["%s"] * len(listing_ids))
+        cursor.execute(LISTING_INDEX_SELECT + f" WHERE id IN ({placeholders})", listing_ids)
+        rows = cursor.fetchall()
+        cursor.close()
+    except Error as e:
+        print(f"Error refreshing listing indexes: {e}")
+        _invalidate_listing_caches()
+        return
+    
+    _invalidate_listing_caches({row['category'] for row in rows})
+    for row in rows:
+        _apply_listing_change(row['id'], None, row)
+
+def _apply_listing_change(listing_id: int, before: Optional[dict], after: Optional[dict]):
+    was_active = before if before and before['status'] == 'active' else None
+    is_active = after if after and after['status'] == 'active' else None
+    listing_facets.apply(was_active, is_active)
+    _apply_to_listing_indexes(listing_id, is_active)
+
+def _apply_to_listing_indexes(listing_id: int, active: Optional[dict]):
+    """Put an active listing row into the viewable set, search indexes and suggester, or drop the id (None)"""
+    if active:
+        listing_views.add_listing(listing_id)
+    else:
+        listing_views.discard_listing(listing_id)
+    if LISTINGS_SEARCH_INDEX:
+        if active:
+            listing_index.add(active)
+        else:
+            listing_index.remove(listing_id)
+    if LISTINGS_FUZZY_SEARCH:
+        if active:
+            listing_trigrams.add(active)
+        else:
+            listing_trigrams.remove(listing_id)
+    if LISTINGS_SUGGEST:
+        if active:
+            listing_suggester.add(active)
+        else:
+            listing_suggester.remove(listing_id)
+
+def _after_listing_delete(listing_id: int, before: dict):
+    _after_listings_delete([(listing_id, before)])
+
+def _after_listings_delete(deleted: list):
+    """Drop deleted listings, as (id, before-image) pairs, from in-process caches, facets and indexes"""
+    if not deleted:
+        return
+    _invalidate_listing_caches({before['category'] for _, before in deleted})
+    for listing_id, before in deleted:
+        if before['status'] == 'active':
+            listing_facets.apply(before, None)
+        listing_index.remove(listing_id)
+        listing_trigrams.remove(listing_id)
+        listing_suggester.remove(listing_id)
+        listing_views.discard_listing(listing_id)
+
+def primary_image(images):
+    """The image shown on cards, carts and orders: the first of a listing's images"""
+    return images[0] if images else None
+
+def backfill_primary_images(batch_size: int = 500):
+    """Fill primary_image for listings written before the column existed; returns rows updated"""
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            cursor.execute("""
+                SELECT id, images FROM listings
+                WHERE id > %s AND primary_image IS NULL AND images IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            
+            changes = []
+            for row in rows:
+                try:
+                    images = json.loads(row['images'])
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                image = primary_image(images) if isinstance(images, list) else None
+                if image:
+                    changes.append((row['id'], image))
+            if changes:
+                cases = " ".join(["WHEN %s THEN %s"] * len(changes))
+                placeholders = ", ".join(["%s"] * len(changes))
+                cursor.execute(f"""
+                    UPDATE listings
+                    SET primary_image = CASE id {cases} END, updated_at = updated_at
+                    WHERE id IN ({placeholders})
+                """, [value for change in changes for value in change] + [listing_id for listing_id, _ in changes])
+                conn.commit()
+                updated += len(changes)
+    finally:
+        cursor.close()
+        conn.close()
+    if updated:
+        _invalidate_listing_caches()
+    return updated
+
+def _parse_listing_fields(fields: Optional[str]):
+    """Normalize a fields= value (names and/or projections) to a tuple of LISTING_FIELDS keys, None for all"""
+    if not fields:
+        return None
+    selected = {'id', 'created_at'}
+    for name in fields.split(','):
+        name = name.strip()
+        if name in LISTING_PROJECTIONS:
+            selected.update(LISTING_PROJECTIONS[name])
+        elif name in LISTING_FIELDS:
+            selected.add(name)
+        elif name:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid field '{name}'. Must be one of: {', '.join([*LISTING_PROJECTIONS, *LISTING_FIELDS])}"
+            )
+    return tuple(field for field in LISTING_FIELDS if field in selected)
+
+def _listing_query_head(fields: Optional[tuple], relevance: Optional[str] = None):
+    """SELECT ... FROM for listing reads, narrowed to fields and only joining users when seller columns are wanted"""
+    if fields is None:
+        query = LISTING_SELECT
+        join_users = True
+    else:
+        query = "SELECT " + ", ".join(LISTING_FIELDS[field] for field in fields)
+        join_users = any(field.startswith('seller_') for field in fields)
+    if relevance:
+        query += f", {relevance} AS relevance"
+    query += """
             FROM listings l
-            JOIN users u ON l.user_id = u.id
-            WHERE l.status = 'active'
-        """
-        params = []
+    """
+    if join_users:
+        query += """        JOIN users u ON l.user_id = u.id
+    """
+    return query
+
+def _parse_listing_images(listings):
+    for listing in listings:
+        if 'images' not in listing:
+            continue
+        if listing['images']:
+            try:
+                listing['images'] = json.loads(listing['images'])
+            except (json.JSONDecodeError, TypeError):
+                listing['images'] = []
+        else:
+            listing['images'] = []
+
+
+def _boolean_search_terms(search: str):
+    """Turn free text into a boolean-mode query where every word must match as a prefix"""
+    words = re.findall(r"\w+", search)
+    return " ".join(f"+{word}*" for word in words)
+
+def _listing_search_filter(search: str, search_mode: str):
+    """SQL condition, params and optional relevance expression for a search string"""
+    if search_mode == 'boolean':
+        terms = _boolean_search_terms(search)
+        if terms:
+            match = FULLTEXT_MATCH.format("BOOLEAN")
+            return match, [terms], match, [terms]
+    elif search_mode == 'fulltext':
+        match = FULLTEXT_MATCH.format("NATURAL LANGUAGE")
+        return match, [search], match, [search]
+
+    search_term = f"%{search}%"
+    return ("(l.title LIKE %s OR l.description LIKE %s OR l.location LIKE %s)",
+            [search_term, search_term, search_term], None, [])
+
+def _count_listings(cursor, where: str, where_params: list, key: tuple, count_mode: str):
+    """Total for the listings page: (total or None, whether it is an estimate)"""
+    if count_mode == 'none':
+        return None, False
+    
+    if count_mode == 'approximate' and all(part is None for part in key):
+        # Table statistics: free, but counts inactive rows and can be off by a few percent
+        cursor.execute("""
+            SELECT TABLE_ROWS AS total
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'listings'
+        """)
+        row = cursor.fetchone()
+        if row and row['total'] is not None:
+            return int(row['total']), True
+    
+    if count_mode != 'exact':
+        total = listing_count_cache.get(key)
+        if total is not None:
+            return total, False
+    
+    cursor.execute("SELECT COUNT(*) as total FROM listings l" + where, where_params)
+    total = cursor.fetchone()['total']
+    if count_mode != 'exact':
+        listing_count_cache.set(key, total)
+    return total, False
+
+def _get_all_listings(db: UnitOfWork, category: str, search: str, limit: int, offset: int, search_mode: str,
+                      after: Optional[str] = None, count_mode: str = 'exact', min_price: Optional[float] = None,
+                      max_price: Optional[float] = None, condition: Optional[str] = None,
+                      sort: Optional[str] = None, fields: Optional[tuple] = None):
+    try:
+        cursor = db.cursor(dictionary=True)
         
-        if category and category != 'All':
-            query += " AND l.category = %s"
-            params.append(category)
+        where = " WHERE l.status = 'active'"
+        where_params = []
+        relevance = None
+        relevance_params = []
         
-        if search:
-            query += " AND (l.title LIKE %s OR l.description LIKE %s OR l.location LIKE %s)"
-            search_term = f"%{search}%"
-            params.extend([search_term, search_term, search_term])
+        if category and category != 'All':
+            where += " AND l.category = %s"
+            where_params.append(category)
         
-        query += " ORDER BY l.created_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
+        if min_price is not None:
+            where += " AND l.price >= %s"
+            where_params.append(min_price)
         
-        cursor.execute(query, params)
-        listings = cursor.fetchall()
+        if max_price is not None:
+            where += " AND l.price <= %s"
+            where_params.append(max_price)
         
+        if condition:
+            where += " AND l.condition_type = %s"
+            where_params.append(condition)
         
+        if search:
+            search_sql, search_params, relevance, relevance_params = _listing_search_filter(search, search_mode)
+            where += f" AND {search_sql}"
+            where_params.extend(search_params)
+        
+        query = _listing_query_head(fields, relevance) + where
+        query_params = relevance_params + where_params
+        next_cursor = None
+        
+        if relevance and not sort:
+            query += " ORDER BY relevance DESC, l.created_at DESC LIMIT %s OFFSET %s"
+            cursor.execute(query, query_params + [limit, offset])
+            listings = cursor.fetchall()
+        elif sort and sort != 'newest':
+            query += f" ORDER BY {LISTING_SORTS[sort]} LIMIT %s OFFSET %s"
+            cursor.execute(query, query_params + [limit, offset])
+            listings = cursor.fetchall()
+        else:
+            # Keyset seek when a cursor is given; offset paging still works but gets slower with depth
+            if after:
+                seek_sql, seek_params = keyset_condition('l', after)
+                query += f" AND {seek_sql}"
+                query_params += seek_params
+                offset = 0
+            query += " ORDER BY l.created_at DESC, l.id DESC LIMIT %s OFFSET %s"
+            cursor.execute(query, query_params + [limit + 1, offset])
+            listings, next_cursor = paginate(cursor.fetchall(), limit)
+        
+        
+        _parse_listing_images(listings)
         for listing in listings:
-            if listing['images']:
-                try:
-                    import json
-                    listing['images'] = json.loads(listing['images'])
-                except (json.JSONDecodeError, TypeError):
-                    listing['images'] = []
-            else:
-                listing['images'] = []
+            if 'relevance' in listing:
+                listing['relevance'] = float(listing['relevance'])
         
        
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM listings l
-            WHERE l.status = 'active'
-        """
-        count_params = []
-        
-        if category and category != 'All':
-            count_query += " AND l.category = %s"
-            count_params.append(category)
-        
-        if search:
-            count_query += " AND (l.title LIKE %s OR l.description LIKE %s OR l.location LIKE %s)"
-            search_term = f"%{search}%"
-            count_params.extend([search_term, search_term, search_term])
-        
-        cursor.execute(count_query, count_params)
-        total_count = cursor.fetchone()['total']
+        count_key = (category if category and category != 'All' else None,
+                     search or None, search_mode if search else None, min_price, max_price, condition or None)
+        total_count, approximate = _count_listings(cursor, where, where_params, count_key, count_mode)
         
         cursor.close()
-        conn.close()
         
         return {
             "listings": listings,
             "total": total_count,
+            "total_approximate": approximate,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
     except Error as e:
         print(f"Error getting all listings: {e}")
         raise HTTPException(status_code=500, detail="Failed to get listings")
 
-@router.post("/api/listings", response_model=dict)
-async def create_listing(listing: ListingCreate, current_user: dict = Depends(get_current_user)):
-    """Create a new listing"""
+
+def _search_listings_from_index(db: UnitOfWork, category: str, search: str, limit: int, offset: int,
+                                index=listing_index, fields: Optional[tuple] = None):
+    """Rank with an in-memory index (BM25 or trigram) and only hydrate the winning ids from MySQL"""
+    ranked, total_count = index.search(
+        search, category if category and category != 'All' else None, limit, offset
+    )
+    listings = []
+    if ranked:
+        try:
+            cursor = db.cursor(dictionary=True)
+            placeholders = ", ".join(["%s"] * len(ranked))
+            cursor.execute(_listing_query_head(fields) + f"""
+                WHERE l.id IN ({placeholders}) AND l.status = 'active'
+            """, [listing_id for listing_id, _ in ranked])
+            rows = {row['id']: row for row in cursor.fetchall()}
+            cursor.close()
+        except Error as e:
+            print(f"Error hydrating listings: {e}")
+            raise HTTPException(status_code=500, detail="Failed to get listings")
+        
+        for listing_id, score in ranked:
+            listing = rows.get(listing_id)
+            if listing:
+                listing['relevance'] = round(score, 4)
+                listings.append(listing)
+        _parse_listing_images(listings)
+    
+    return {
+        "listings": listings,
+        "total": total_count,
+        "total_approximate": False,
+        "limit": limit,
+        "offset": offset,
+        "next_cursor": None
+    }
+
+
+@router.get("/api/listings/search-index", response_model=dict)
+async def get_search_index_stats():
+    """In-memory listing search index statistics"""
+    return {
+        "enabled": LISTINGS_SEARCH_INDEX,
+        **listing_index.stats(),
+        "fuzzy": {"enabled": LISTINGS_FUZZY_SEARCH, **listing_trigrams.stats()},
+    }
+
+@router.get("/api/listings/suggest", response_model=dict)
+async def suggest_listings(q: str = "", limit: int = Query(8, ge=1, le=20)):
+    """Typeahead: listing titles and categories starting with q, answered from memory"""
+    if not LISTINGS_SUGGEST:
+        raise HTTPException(status_code=400, detail="Suggestions are disabled")
+    prefix = q.strip().lower()
+    categories = listing_facets.snapshot()["categories"] if prefix else {}
+    return {
+        "query": q,
+        "suggestions": listing_suggester.suggest(q, limit),
+        "categories": sorted(
+            (name for name in categories if name and name.lower().startswith(prefix)),
+            key=lambda name: -categories[name]
+        )[:limit],
+    }
+
+@router.get("/api/listings/suggest-index", response_model=dict)
+async def get_suggest_index_stats():
+    """In-memory typeahead index statistics"""
+    return {"enabled": LISTINGS_SUGGEST, **listing_suggester.stats()}
+
+@router.post("/api/listings/{listing_id}/view", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def record_listing_view(listing_id: int, request: Request):
+    """Count a listing view; buffered in memory and written to views in periodic batches
+
+    Views of inactive or unknown listings and a client's repeat views within
+    LISTING_VIEWS_DEDUPE_TTL seconds are not counted (accepted: false).
+    """
+    client = request.client.host if request.client else None
+    return {"listing_id": listing_id, "accepted": listing_views.record(listing_id, client=client)}
+
+@router.get("/api/listings/view-stats", response_model=dict)
+async def get_listing_view_stats():
+    """Write-behind view counter buffer statistics"""
+    return {"flush_interval": LISTING_VIEWS_FLUSH_INTERVAL, **listing_views.stats()}
+
+@router.get("/api/listings/facets", response_model=dict)
+async def get_listing_facets(category: str = None):
+    """Active listing counts per category and per condition (conditions narrowed to category if given)"""
+    return listing_facets.snapshot(category if category and category != 'All' else None)
+
+@router.get("/api/listings/cache-stats", response_model=dict)
+async def get_listing_cache_stats():
+    """Hit/miss counters for the in-process listing caches"""
+    return {
+        "count_cache": listing_count_cache.stats(),
+        "response_cache": listing_response_cache.stats(),
+    }
+
+@router.get("/api/listings", response_model=dict)
+async def get_all_listings(request: Request, category: str = None, search: str = None,
+                           limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), offset: int = Query(0, ge=0),
+                           search_mode: str = None, after: Optional[str] = Query(None, alias="cursor"),
+                           count: str = None, min_price: Optional[float] = Query(None, ge=0),
+                           max_price: Optional[float] = Query(None, ge=0), condition: str = None,
+                           sort: str = None, fields: str = None, db: UnitOfWork = Depends(get_db)):
+    """Get all active listings for the shop page
+
+    search_mode: fulltext (natural language, relevance ranked), boolean (every word
+    as a prefix), like (substring scan) or index (in-memory BM25, needs
+    LISTINGS_SEARCH_INDEX) or fuzzy (typo-tolerant trigram match on titles, needs
+    LISTINGS_FUZZY_SEARCH). Defaults to LISTINGS_SEARCH_MODE.
+    min_price / max_price / condition: narrow to a price range and condition_type.
+    sort: newest, price_asc, price_desc or most_viewed. Defaults to relevance for
+    ranked searches and newest otherwise.
+    fields: comma-separated listing fields and/or projections (card: what a shop
+    grid card shows) to select and return instead of every column.
+    cursor: next_cursor from the previous page; seeks on (created_at, id) instead
+    of skipping offset rows. Only applies to newest-first ordering; rejected with
+    relevance-ranked searches and other sorts.
+    count: exact, cached (exact, reused for LISTINGS_COUNT_CACHE_TTL seconds),
+    approximate (table statistics when unfiltered) or none. Defaults to
+    LISTINGS_COUNT_MODE.
+    Serialized pages are cached for LISTINGS_RESPONSE_CACHE_TTL seconds (0 disables)
+    and dropped as soon as a listing in the same category is written. Each page
+    carries an ETag; a matching If-None-Match on a cached page is answered with
+    304 without touching the database.
+    """
+    search_mode = search_mode or LISTINGS_SEARCH_MODE
+    if search_mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid search_mode. Must be one of: {', '.join(SEARCH_MODES)}")
+    count_mode = count or LISTINGS_COUNT_MODE
+    if count_mode not in COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid count. Must be one of: {', '.join(COUNT_MODES)}")
+    if sort is not None and sort not in LISTING_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Must be one of: {', '.join(LISTING_SORTS)}")
+    if after and sort not in (None, 'newest'):
+        raise HTTPException(status_code=400, detail="cursor is only supported with sort=newest")
+    filtered = min_price is not None or max_price is not None or condition or sort
+    if search_mode in ('index', 'fuzzy') and search and filtered:
+        raise HTTPException(status_code=400, detail=f"search_mode={search_mode} does not support price, condition or sort")
+    if search_mode == 'index':
+        if not LISTINGS_SEARCH_INDEX:
+            raise HTTPException(status_code=400, detail="Search index is disabled")
+        if not (search and listing_index.ready):
+            search_mode = 'fulltext'
+    elif search_mode == 'fuzzy':
+        if not LISTINGS_FUZZY_SEARCH:
+            raise HTTPException(status_code=400, detail="Fuzzy search is disabled")
+        if not (search and listing_trigrams.ready):
+            search_mode = 'like'
+    if after and search and not sort and (search_mode in ('index', 'fuzzy', 'fulltext') or
+                                          (search_mode == 'boolean' and _boolean_search_terms(search))):
+        # Relevance order has no (created_at, id) seek point, so the cursor would be ignored
+        raise HTTPException(status_code=400, detail="cursor is not supported with relevance-ranked search; use offset or sort=newest")
+    
+    category = category if category and category != 'All' else None
+    search = search or None
+    cache_key = (category, search, search_mode if search else None, min_price, max_price, condition or None,
+                 sort, limit, offset, after, count_mode, _parse_listing_fields(fields))
+    cached = listing_response_cache.get(cache_key) if LISTINGS_RESPONSE_CACHE_TTL > 0 else None
+    if cached is not None:
+        body, etag = cached
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return Response(content=body, media_type="application/json",
+                        headers={"X-Cache": "HIT", "ETag": etag, "Cache-Control": "no-cache"})
+    
+    body, etag = await run_db(_render_listings_page, db, cache_key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json",
+                    headers={"X-Cache": "MISS", "ETag": etag, "Cache-Control": "no-cache"})
+
+def _render_listings_page(db: UnitOfWork, cache_key: tuple):
+    """Run the listings query and serialize it once, caching the bytes unless a write raced it"""
+    category, search, search_mode, min_price, max_price, condition, sort, limit, offset, after, count_mode, fields = cache_key
+    generation = _listing_cache_generation
+    if search_mode == 'index':
+        result = _search_listings_from_index(db, category, search, limit, offset, listing_index, fields)
+    elif search_mode == 'fuzzy':
+        result = _search_listings_from_index(db, category, search, limit, offset, listing_trigrams, fields)
+    else:
+        result = _get_all_listings(db, category, search, limit, offset, search_mode or 'fulltext', after, count_mode,
+                                   min_price, max_price, condition, sort, fields)
+    body = FastJSONResponse(result).body
+    etag = body_etag(body)
+    if LISTINGS_RESPONSE_CACHE_TTL > 0:
+        with _generation_lock:
+            if generation == _listing_cache_generation:
+                listing_response_cache.set(cache_key, (body, etag))
+    return body, etag
+
+def _listing_insert_values(listing: ListingCreate, user_id: int):
+    images_json = json.dumps(listing.images) if listing.images else None
+    return (user_id, listing.title, listing.description, listing.price, listing.category, listing.condition,
+            listing.location, images_json, primary_image(listing.images), user_id)
+
+LISTING_INSERT = """
+            INSERT INTO listings (user_id, title, description, price, category, condition_type, location, images,
+                                  primary_image, seller_id)
+            VALUES """
+LISTING_INSERT_ROW = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+def _create_listing(db: UnitOfWork, listing: ListingCreate, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
-        images_json = None
-        if listing.images and len(listing.images) > 0:
-            import json
-            images_json = json.dumps(listing.images)
-        
-        cursor.execute("""
-            INSERT INTO listings (user_id, title, description, price, category, condition_type, location, images, seller_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            current_user['id'],
-            listing.title,
-            listing.description,
-            listing.price,
-            listing.category,
-            listing.condition,
-            listing.location,
-            images_json,
-            current_user['id']
-        ))
+        cursor.execute(LISTING_INSERT + LISTING_INSERT_ROW, _listing_insert_values(listing, current_user['id']))
         
         listing_id = cursor.lastrowid
+        db.commit()
         cursor.close()
-        conn.close()
+        _after_listing_write(db, listing_id)
         
         return {"message": "Listing created successfully", "listing_id": listing_id}
     except Error as e:
         print(f"Error creating listing: {e}")
         raise HTTPException(status_code=500, detail="Failed to create listing")
 
-@router.get("/api/listings/my", response_model=dict)
-async def get_my_listings(current_user: dict = Depends(get_current_user)):
-    """Get current user's listings"""
+
+@router.post("/api/listings", response_model=dict)
+async def create_listing(listing: ListingCreate, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Create a new listing"""
+    return await run_db(_create_listing, db, listing, current_user)
+
+def _get_my_listings(db: UnitOfWork, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
         cursor.execute("""
             SELECT id, title, description, price, category, condition_type, location, 
@@ -353,35 +1058,160 @@ async def get_my_listings(current_user: dict = Depends(get_current_user)):
         """, (current_user['id'],))
         
         listings = cursor.fetchall()
-        
-        
-        for listing in listings:
-            if listing['images']:
-                try:
-                    import json
-                    listing['images'] = json.loads(listing['images'])
-                except (json.JSONDecodeError, TypeError):
-                    listing['images'] = []
-            else:
-                listing['images'] = []
+        _parse_listing_images(listings)
         
         cursor.close()
-        conn.close()
         
         return {"listings": listings}
     except Error as e:
         print(f"Error getting listings: {e}")
         raise HTTPException(status_code=500, detail="Failed to get listings")
 
-@router.put("/api/listings/{listing_id}", response_model=dict)
-async def update_listing(listing_id: int, listing: ListingUpdate, current_user: dict = Depends(get_current_user)):
-    """Update a listing"""
+
+def _record_import_error(report: dict, row_number: int, message: str):
+    report["failed"] += 1
+    if len(report["errors"]) < LISTINGS_IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": row_number, "error": message})
+    else:
+        report["errors_truncated"] = True
+
+def _validate_import_row(record: tuple, report: dict):
+    """(row_number, ListingCreate) for a parsed row, or None after recording why it was rejected"""
+    row_number, data, error = record
+    if error is None:
+        try:
+            return row_number, ListingCreate(**data)
+        except ValidationError as e:
+            error = validation_message(e)
+    _record_import_error(report, row_number, error)
+    return None
+
+def _import_listing_chunk(db: UnitOfWork, chunk: list, user_id: int, report: dict):
+    """Insert validated rows with one multi-row INSERT in one transaction
+
+    If the batch is rejected, the rows are retried one by one so the bad ones
+    can be reported by row number while the rest still get imported.
+    """
+    cursor = db.cursor()
+    listing_ids = []
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor.execute(
+            LISTING_INSERT + ", ".join([LISTING_INSERT_ROW] * len(chunk)),
+            [value for _, listing in chunk for value in _listing_insert_values(listing, user_id)]
+        )
+        # A multi-row INSERT gets consecutive auto-increment ids starting at lastrowid
+        listing_ids = list(range(cursor.lastrowid, cursor.lastrowid + len(chunk)))
+        db.commit()
+    except Error as e:
+        db.rollback()
+        print(f"Error importing listing batch, retrying row by row: {e}")
+        for row_number, listing in chunk:
+            try:
+                cursor.execute(LISTING_INSERT + LISTING_INSERT_ROW, _listing_insert_values(listing, user_id))
+                listing_ids.append(cursor.lastrowid)
+                db.commit()
+            except Error as row_error:
+                db.rollback()
+                _record_import_error(report, row_number, row_error.msg)
+    cursor.close()
+    report["imported"] += len(listing_ids)
+    _after_listing_bulk_insert(db, listing_ids)
+
+def _new_import_report():
+    return {"imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+def import_listing_lines(db: UnitOfWork, lines, fmt: str, user_id: int, chunk_size: int = None):
+    """Import NDJSON/CSV lines for user_id synchronously; used by the CLI"""
+    chunk_size = chunk_size or LISTINGS_IMPORT_CHUNK
+    parser = RowParser(fmt)
+    report = _new_import_report()
+    chunk = []
+    
+    def records():
+        for line in lines:
+            yield from parser.feed(line)
+        yield from parser.close()
+    
+    for record in records():
+        row = _validate_import_row(record, report)
+        if row:
+            chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _import_listing_chunk(db, chunk, user_id, report)
+            chunk = []
+    if chunk:
+        _import_listing_chunk(db, chunk, user_id, report)
+    return report
+
+@router.post("/api/listings/import", response_model=dict)
+async def import_listings(request: Request, format: str = None, current_user: dict = Depends(get_current_user),
+                          db: UnitOfWork = Depends(get_db)):
+    """Bulk-create listings from an NDJSON or CSV request body, streamed and inserted in batches
+
+    format: ndjson or csv; defaults from the Content-Type (text/csv means csv).
+    CSV needs a header row naming ListingCreate fields; images may be a JSON
+    array or URLs separated by |. Every row is validated like POST /api/listings
+    and rejected rows are reported by row number without stopping the import.
+    """
+    fmt = format or ('csv' if 'csv' in request.headers.get('content-type', '') else 'ndjson')
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {', '.join(IMPORT_FORMATS)}")
+    
+    parser = RowParser(fmt)
+    report = _new_import_report()
+    chunk = []
+    
+    async def records():
+        async for line in aiter_lines(request.stream()):
+            for record in parser.feed(line):
+                yield record
+        for record in parser.close():
+            yield record
+    
+    try:
+        async for record in records():
+            row = _validate_import_row(record, report)
+            if row:
+                chunk.append(row)
+            if len(chunk) >= LISTINGS_IMPORT_CHUNK:
+                await run_db(_import_listing_chunk, db, chunk, current_user['id'], report)
+                chunk = []
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be UTF-8")
+    if chunk:
+        await run_db(_import_listing_chunk, db, chunk, current_user['id'], report)
+    return report
+
+@router.get("/api/listings/export")
+async def export_listings(format: str = 'ndjson', category: str = None, after_id: int = 0,
+                          current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Stream every active listing as NDJSON or CSV in id order
+
+    after_id: id of the last row already received, to resume an interrupted export.
+    """
+    query = LISTING_SELECT + """
+            FROM listings l
+            JOIN users u ON l.user_id = u.id
+            WHERE l.status = 'active' AND l.id > %s
+    """
+    params = [after_id]
+    if category and category != 'All':
+        query += " AND l.category = %s"
+        params.append(category)
+    query += " ORDER BY l.id"
+    return await stream_export(query, params, format, "listings", lambda row: _parse_listing_images([row]), db=db)
+
+@router.get("/api/listings/my", response_model=dict)
+async def get_my_listings(current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Get current user's listings"""
+    return FastJSONResponse(await run_db(_get_my_listings, db, current_user))
+
+def _update_listing(db: UnitOfWork, listing_id: int, listing: ListingUpdate, current_user: dict):
+    try:
+        cursor = db.cursor()
         
         
-        cursor.execute("SELECT user_id FROM listings WHERE id = %s", (listing_id,))
+        cursor.execute("SELECT user_id, category, condition_type, status FROM listings WHERE id = %s", (listing_id,))
         result = cursor.fetchone()
         
         if not result or result[0] != current_user['id']:
@@ -396,9 +1226,10 @@ async def update_listing(listing_id: int, listing: ListingUpdate, current_user:
                 if field == 'images':
                     update_fields.append(f"{field} = %s")
                     
-                    import json
                     images_json = json.dumps(value) if value else None
                     values.append(images_json)
+                    update_fields.append("primary_image = %s")
+                    values.append(primary_image(value))
                 elif field == 'condition':
                    
                     update_fields.append(f"condition_type = %s")
@@ -414,31 +1245,36 @@ async def update_listing(listing_id: int, listing: ListingUpdate, current_user:
         query = f"UPDATE listings SET {', '.join(update_fields)} WHERE id = %s"
         
         cursor.execute(query, values)
+        db.commit()
         cursor.close()
-        conn.close()
+        _after_listing_write(db, listing_id, _listing_before_write(result))
         
         return {"message": "Listing updated successfully"}
     except Error as e:
         print(f"Error updating listing: {e}")
         raise HTTPException(status_code=500, detail="Failed to update listing")
 
-@router.delete("/api/listings/{listing_id}", response_model=dict)
-async def delete_listing(listing_id: int, current_user: dict = Depends(get_current_user)):
-    """Delete a listing"""
+
+@router.put("/api/listings/{listing_id}", response_model=dict)
+async def update_listing(listing_id: int, listing: ListingUpdate, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Update a listing"""
+    return await run_db(_update_listing, db, listing_id, listing, current_user)
+
+def _delete_listing(db: UnitOfWork, listing_id: int, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
-        cursor.execute("SELECT user_id FROM listings WHERE id = %s", (listing_id,))
+        cursor.execute("SELECT user_id, category, condition_type, status FROM listings WHERE id = %s", (listing_id,))
         result = cursor.fetchone()
         
         if not result or result[0] != current_user['id']:
             raise HTTPException(status_code=403, detail="Not authorized to delete this listing")
         
         cursor.execute("DELETE FROM listings WHERE id = %s", (listing_id,))
+        db.commit()
         cursor.close()
-        conn.close()
+        _after_listing_delete(listing_id, _listing_before_write(result))
         
         return {"message": "Listing deleted successfully"}
     except Error as e:
@@ -446,12 +1282,15 @@ async def delete_listing(listing_id: int, current_user: dict = Depends(get_curre
         raise HTTPException(status_code=500, detail="Failed to delete listing")
 
 
-@router.post("/api/messages", response_model=dict)
-async def send_message(message: MessageCreate, current_user: dict = Depends(get_current_user)):
-    """Send a message"""
+@router.delete("/api/listings/{listing_id}", response_model=dict)
+async def delete_listing(listing_id: int, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Delete a listing"""
+    return await run_db(_delete_listing, db, listing_id, current_user)
+
+
+def _send_message(db: UnitOfWork, message: MessageCreate, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         cursor.execute("""
             INSERT INTO messages (sender_id, recipient_id, subject, content, listing_id)
@@ -465,22 +1304,25 @@ async def send_message(message: MessageCreate, current_user: dict = Depends(get_
         ))
         
         message_id = cursor.lastrowid
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {"message": "Message sent successfully", "message_id": message_id}
     except Error as e:
         print(f"Error sending message: {e}")
         raise HTTPException(status_code=500, detail="Failed to send message")
 
-@router.get("/api/messages/inbox", response_model=dict)
-async def get_inbox(current_user: dict = Depends(get_current_user)):
-    """Get received messages"""
+
+@router.post("/api/messages", response_model=dict)
+async def send_message(message: MessageCreate, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Send a message"""
+    return await run_db(_send_message, db, message, current_user)
+
+def _get_inbox(db: UnitOfWork, current_user: dict, limit: Optional[int], after: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
-        cursor.execute("""
+        messages, next_cursor = fetch_page(cursor, """
             SELECT m.id, m.subject, m.content, m.is_read, m.created_at,
                    u.name as sender_name, u.email as sender_email,
                    l.title as listing_title
@@ -488,26 +1330,26 @@ async def get_inbox(current_user: dict = Depends(get_current_user)):
             JOIN users u ON m.sender_id = u.id
             LEFT JOIN listings l ON m.listing_id = l.id
             WHERE m.recipient_id = %s
-            ORDER BY m.created_at DESC
-        """, (current_user['id'],))
-        
-        messages = cursor.fetchall()
+        """, (current_user['id'],), 'm', limit, after)
         cursor.close()
-        conn.close()
         
-        return {"messages": messages}
+        return {"messages": messages, "next_cursor": next_cursor}
     except Error as e:
         print(f"Error getting inbox: {e}")
         raise HTTPException(status_code=500, detail="Failed to get messages")
 
-@router.get("/api/messages/sent", response_model=dict)
-async def get_sent_messages(current_user: dict = Depends(get_current_user)):
-    """Get sent messages"""
+
+@router.get("/api/messages/inbox", response_model=dict)
+async def get_inbox(current_user: dict = Depends(get_current_user),
+                    limit: Optional[int] = None, after: Optional[str] = Query(None, alias="cursor"), db: UnitOfWork = Depends(get_db)):
+    """Get received messages"""
+    return FastJSONResponse(await run_db(_get_inbox, db, current_user, limit, after))
+
+def _get_sent_messages(db: UnitOfWork, current_user: dict, limit: Optional[int], after: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
-        cursor.execute("""
+        messages, next_cursor = fetch_page(cursor, """
             SELECT m.id, m.subject, m.content, m.created_at,
                    u.name as recipient_name, u.email as recipient_email,
                    l.title as listing_title
@@ -515,24 +1357,24 @@ async def get_sent_messages(current_user: dict = Depends(get_current_user)):
             JOIN users u ON m.recipient_id = u.id
             LEFT JOIN listings l ON m.listing_id = l.id
             WHERE m.sender_id = %s
-            ORDER BY m.created_at DESC
-        """, (current_user['id'],))
-        
-        messages = cursor.fetchall()
+        """, (current_user['id'],), 'm', limit, after)
         cursor.close()
-        conn.close()
         
-        return {"messages": messages}
+        return {"messages": messages, "next_cursor": next_cursor}
     except Error as e:
         print(f"Error getting sent messages: {e}")
         raise HTTPException(status_code=500, detail="Failed to get sent messages")
 
-@router.put("/api/messages/{message_id}/read", response_model=dict)
-async def mark_message_read(message_id: int, current_user: dict = Depends(get_current_user)):
-    """Mark a message as read"""
+
+@router.get("/api/messages/sent", response_model=dict)
+async def get_sent_messages(current_user: dict = Depends(get_current_user),
+                            limit: Optional[int] = None, after: Optional[str] = Query(None, alias="cursor"), db: UnitOfWork = Depends(get_db)):
+    """Get sent messages"""
+    return FastJSONResponse(await run_db(_get_sent_messages, db, current_user, limit, after))
+
+def _mark_message_read(db: UnitOfWork, message_id: int, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         cursor.execute("""
             UPDATE messages 
@@ -540,8 +1382,8 @@ async def mark_message_read(message_id: int, current_user: dict = Depends(get_cu
             WHERE id = %s AND recipient_id = %s
         """, (message_id, current_user['id']))
         
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {"message": "Message marked as read"}
     except Error as e:
@@ -549,12 +1391,15 @@ async def mark_message_read(message_id: int, current_user: dict = Depends(get_cu
         raise HTTPException(status_code=500, detail="Failed to mark message as read")
 
 
-@router.post("/api/orders", response_model=dict)
-async def create_order(order: OrderCreate, current_user: dict = Depends(get_current_user)):
-    """Create a new order"""
+@router.put("/api/messages/{message_id}/read", response_model=dict)
+async def mark_message_read(message_id: int, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Mark a message as read"""
+    return await run_db(_mark_message_read, db, message_id, current_user)
+
+
+def _create_order(db: UnitOfWork, order: OrderCreate, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         cursor.execute("""
@@ -584,22 +1429,25 @@ async def create_order(order: OrderCreate, current_user: dict = Depends(get_curr
         ))
         
         order_id = cursor.lastrowid
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {"message": "Order created successfully", "order_id": order_id}
     except Error as e:
         print(f"Error creating order: {e}")
         raise HTTPException(status_code=500, detail="Failed to create order")
 
-@router.get("/api/orders/my", response_model=dict)
-async def get_my_orders(current_user: dict = Depends(get_current_user)):
-    """Get current user's orders"""
+
+@router.post("/api/orders", response_model=dict)
+async def create_order(order: OrderCreate, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Create a new order"""
+    return await run_db(_create_order, db, order, current_user)
+
+def _get_my_orders(db: UnitOfWork, current_user: dict, limit: Optional[int], after: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
-        cursor.execute("""
+        orders, next_cursor = fetch_page(cursor, """
             SELECT o.id, o.quantity, o.total_price, o.shipping_address, 
                    o.payment_method, o.`status`, o.created_at, o.updated_at,
                    l.title as listing_title, l.description as listing_description,
@@ -608,26 +1456,26 @@ async def get_my_orders(current_user: dict = Depends(get_current_user)):
             JOIN listings l ON o.listing_id = l.id
             JOIN users u ON o.seller_id = u.id
             WHERE o.buyer_id = %s
-            ORDER BY o.created_at DESC
-        """, (current_user['id'],))
-        
-        orders = cursor.fetchall()
+        """, (current_user['id'],), 'o', limit, after)
         cursor.close()
-        conn.close()
         
-        return {"orders": orders}
+        return {"orders": orders, "next_cursor": next_cursor}
     except Error as e:
         print(f"Error getting orders: {e}")
         raise HTTPException(status_code=500, detail="Failed to get orders")
 
-@router.get("/api/orders/sales", response_model=dict)
-async def get_sales_orders(current_user: dict = Depends(get_current_user)):
-    """Get orders for user's listings (sales)"""
+
+@router.get("/api/orders/my", response_model=dict)
+async def get_my_orders(current_user: dict = Depends(get_current_user),
+                        limit: Optional[int] = None, after: Optional[str] = Query(None, alias="cursor"), db: UnitOfWork = Depends(get_db)):
+    """Get current user's orders"""
+    return FastJSONResponse(await run_db(_get_my_orders, db, current_user, limit, after))
+
+def _get_sales_orders(db: UnitOfWork, current_user: dict, limit: Optional[int], after: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
-        cursor.execute("""
+        orders, next_cursor = fetch_page(cursor, """
             SELECT o.id, o.quantity, o.total_price, o.shipping_address, 
                    o.payment_method, o.`status`, o.created_at, o.updated_at,
                    l.title as listing_title, l.description as listing_description,
@@ -636,24 +1484,24 @@ async def get_sales_orders(current_user: dict = Depends(get_current_user)):
             JOIN listings l ON o.listing_id = l.id
             JOIN users u ON o.buyer_id = u.id
             WHERE o.seller_id = %s
-            ORDER BY o.created_at DESC
-        """, (current_user['id'],))
-        
-        orders = cursor.fetchall()
+        """, (current_user['id'],), 'o', limit, after)
         cursor.close()
-        conn.close()
         
-        return {"orders": orders}
+        return {"orders": orders, "next_cursor": next_cursor}
     except Error as e:
         print(f"Error getting sales orders: {e}")
         raise HTTPException(status_code=500, detail="Failed to get sales orders")
 
-@router.put("/api/orders/{order_id}/status", response_model=dict)
-async def update_order_status(order_id: int, status: str, current_user: dict = Depends(get_current_user)):
-    """Update order status"""
+
+@router.get("/api/orders/sales", response_model=dict)
+async def get_sales_orders(current_user: dict = Depends(get_current_user),
+                           limit: Optional[int] = None, after: Optional[str] = Query(None, alias="cursor"), db: UnitOfWork = Depends(get_db)):
+    """Get orders for user's listings (sales)"""
+    return FastJSONResponse(await run_db(_get_sales_orders, db, current_user, limit, after))
+
+def _update_order_status(db: UnitOfWork, order_id: int, status: str, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         cursor.execute("""
@@ -668,8 +1516,8 @@ async def update_order_status(order_id: int, status: str, current_user: dict = D
             UPDATE orders SET `status` = %s WHERE id = %s
         """, (status, order_id))
         
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {"message": "Order status updated successfully"}
     except Error as e:
@@ -677,12 +1525,30 @@ async def update_order_status(order_id: int, status: str, current_user: dict = D
         raise HTTPException(status_code=500, detail="Failed to update order status")
 
 
-@router.post("/api/reviews", response_model=dict)
-async def create_review(review: ReviewCreate, current_user: dict = Depends(get_current_user)):
-    """Create a review"""
+@router.get("/api/orders/sales/export")
+async def export_sales_orders(format: str = 'ndjson', after_id: int = 0,
+                              current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Stream all of the user's sales orders as NDJSON or CSV in id order, resumable with after_id"""
+    return await stream_export("""
+            SELECT o.id, o.listing_id, o.quantity, o.total_price, o.shipping_address,
+                   o.payment_method, o.`status`, o.created_at, o.updated_at,
+                   l.title as listing_title, u.name as buyer_name
+            FROM orders o
+            JOIN listings l ON o.listing_id = l.id
+            JOIN users u ON o.buyer_id = u.id
+            WHERE o.seller_id = %s AND o.id > %s
+            ORDER BY o.id
+    """, [current_user['id'], after_id], format, "sales-orders", db=db)
+
+@router.put("/api/orders/{order_id}/status", response_model=dict)
+async def update_order_status(order_id: int, status: str, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Update order status"""
+    return await run_db(_update_order_status, db, order_id, status, current_user)
+
+
+def _create_review(db: UnitOfWork, review: ReviewCreate, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         cursor.execute("""
@@ -721,22 +1587,25 @@ async def create_review(review: ReviewCreate, current_user: dict = Depends(get_c
         ))
         
         review_id = cursor.lastrowid
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {"message": "Review created successfully", "review_id": review_id}
     except Error as e:
         print(f"Error creating review: {e}")
         raise HTTPException(status_code=500, detail="Failed to create review")
 
-@router.get("/api/reviews/received", response_model=dict)
-async def get_received_reviews(current_user: dict = Depends(get_current_user)):
-    """Get reviews received by current user"""
+
+@router.post("/api/reviews", response_model=dict)
+async def create_review(review: ReviewCreate, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Create a review"""
+    return await run_db(_create_review, db, review, current_user)
+
+def _get_received_reviews(db: UnitOfWork, current_user: dict, limit: Optional[int], after: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
-        cursor.execute("""
+        reviews, next_cursor = fetch_page(cursor, """
             SELECT r.id, r.rating, r.comment, r.created_at,
                    u.name as reviewer_name,
                    o.listing_id,
@@ -745,27 +1614,27 @@ async def get_received_reviews(current_user: dict = Depends(get_current_user)):
             JOIN users u ON r.reviewer_id = u.id
             JOIN orders o ON r.order_id = o.id
             JOIN listings l ON o.listing_id = l.id
-            WHERE r.reviewee_id = %s OR r.reviewed_user_id = %s
-            ORDER BY r.created_at DESC
-        """, (current_user['id'], current_user['id']))
-        
-        reviews = cursor.fetchall()
+            WHERE (r.reviewee_id = %s OR r.reviewed_user_id = %s)
+        """, (current_user['id'], current_user['id']), 'r', limit, after)
         cursor.close()
-        conn.close()
         
-        return {"reviews": reviews}
+        return {"reviews": reviews, "next_cursor": next_cursor}
     except Error as e:
         print(f"Error getting received reviews: {e}")
         raise HTTPException(status_code=500, detail="Failed to get reviews")
 
-@router.get("/api/reviews/given", response_model=dict)
-async def get_given_reviews(current_user: dict = Depends(get_current_user)):
-    """Get reviews given by current user"""
+
+@router.get("/api/reviews/received", response_model=dict)
+async def get_received_reviews(current_user: dict = Depends(get_current_user),
+                               limit: Optional[int] = None, after: Optional[str] = Query(None, alias="cursor"), db: UnitOfWork = Depends(get_db)):
+    """Get reviews received by current user"""
+    return FastJSONResponse(await run_db(_get_received_reviews, db, current_user, limit, after))
+
+def _get_given_reviews(db: UnitOfWork, current_user: dict, limit: Optional[int], after: Optional[str]):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         
-        cursor.execute("""
+        reviews, next_cursor = fetch_page(cursor, """
             SELECT r.id, r.rating, r.comment, r.created_at,
                    u.name as reviewee_name,
                    o.listing_id,
@@ -775,25 +1644,25 @@ async def get_given_reviews(current_user: dict = Depends(get_current_user)):
             JOIN orders o ON r.order_id = o.id
             JOIN listings l ON o.listing_id = l.id
             WHERE r.reviewer_id = %s
-            ORDER BY r.created_at DESC
-        """, (current_user['id'],))
-        
-        reviews = cursor.fetchall()
+        """, (current_user['id'],), 'r', limit, after)
         cursor.close()
-        conn.close()
         
-        return {"reviews": reviews}
+        return {"reviews": reviews, "next_cursor": next_cursor}
     except Error as e:
         print(f"Error getting given reviews: {e}")
         raise HTTPException(status_code=500, detail="Failed to get reviews")
 
 
-@router.get("/api/dashboard/stats", response_model=dict)
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    """Get dashboard statistics"""
+@router.get("/api/reviews/given", response_model=dict)
+async def get_given_reviews(current_user: dict = Depends(get_current_user),
+                            limit: Optional[int] = None, after: Optional[str] = Query(None, alias="cursor"), db: UnitOfWork = Depends(get_db)):
+    """Get reviews given by current user"""
+    return FastJSONResponse(await run_db(_get_given_reviews, db, current_user, limit, after))
+
+
+def _get_dashboard_stats(db: UnitOfWork, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         cursor.execute("SELECT COUNT(*) FROM listings WHERE user_id = %s", (current_user['id'],))
@@ -812,7 +1681,6 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         avg_rating = cursor.fetchone()[0] or 0
         
         cursor.close()
-        conn.close()
         
         return {
             "listings_count": listings_count,
@@ -826,16 +1694,19 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail="Failed to get dashboard statistics")
 
 
+@router.get("/api/dashboard/stats", response_model=dict)
+async def get_dashboard_stats(current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Get dashboard statistics"""
+    return await run_db(_get_dashboard_stats, db, current_user)
+
+
 class ProfileUpdate(BaseModel):
     name: str
     email: str
 
-@router.put("/api/profile", response_model=dict)
-async def update_profile(profile_data: ProfileUpdate, current_user: dict = Depends(get_current_user)):
-    """Update user profile"""
+def _update_profile(db: UnitOfWork, profile_data: ProfileUpdate, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         
         cursor.execute("SELECT id FROM users WHERE email = %s AND id != %s", (profile_data.email, current_user['id']))
@@ -859,8 +1730,10 @@ async def update_profile(profile_data: ProfileUpdate, current_user: dict = Depen
         """, (current_user['id'],))
         
         updated_user = cursor.fetchone()
+        db.commit()
+        invalidate_user(current_user['email'])
+        invalidate_user(profile_data.email)
         cursor.close()
-        conn.close()
         
         if not updated_user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -876,20 +1749,34 @@ async def update_profile(profile_data: ProfileUpdate, current_user: dict = Depen
         print(f"Error updating profile: {e}")
         raise HTTPException(status_code=500, detail="Failed to update profile")
 
-@router.delete("/api/profile", response_model=dict)
-async def delete_profile(current_user: dict = Depends(get_current_user)):
-    """Delete user profile and all associated data"""
+
+@router.put("/api/profile", response_model=dict)
+async def update_profile(profile_data: ProfileUpdate, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Update user profile"""
+    return await run_db(_update_profile, db, profile_data, current_user)
+
+def _delete_profile(db: UnitOfWork, current_user: dict):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
+        cursor = db.cursor()
         
+        # The user's listings go with them (ON DELETE CASCADE); remember them for the in-process indexes
+        cursor.execute("SELECT id, user_id, category, condition_type, status FROM listings WHERE user_id = %s",
+                       (current_user['id'],))
+        deleted = [(row[0], _listing_before_write(row[1:])) for row in cursor.fetchall()]
         cursor.execute("DELETE FROM users WHERE id = %s", (current_user['id'],))
         
+        db.commit()
+        invalidate_user(current_user['email'])
         cursor.close()
-        conn.close()
+        _after_listings_delete(deleted)
         
         return {"message": "Profile deleted successfully"}
     except Error as e:
         print(f"Error deleting profile: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete profile")
+
+
+@router.delete("/api/profile", response_model=dict)
+async def delete_profile(current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Delete user profile and all associated data"""
+    return await run_db(_delete_profile, db, current_user)
@@ -0,0 +1,418 @@
+import asyncio
+import collections
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import mysql.connector
+from mysql.connector import Error
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'ecofinds_db'),
+    'charset': 'utf8mb4',
+    'autocommit': True
+}
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 3600))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+# Headroom over the pool limit for background jobs that check out connections on a worker thread
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW + 4))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout"""
+
+
+class PooledConnection:
+    """A borrowed connection; close() hands it back to the pool instead of disconnecting"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+        self._on_release = None
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool._release(self._raw, self._created_at)
+            self._notify_release()
+
+    def invalidate(self):
+        """Close the connection instead of pooling it, e.g. when an unbuffered result was abandoned mid-read"""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._raw, self._created_at, reuse=False)
+            self._notify_release()
+
+    def _notify_release(self):
+        if self._on_release is not None:
+            try:
+                self._on_release()
+            except RuntimeError:  # the event loop that borrowed it is already closed
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        # Settings such as autocommit must reach the MySQL connection, not this wrapper
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def __del__(self):
+        # Handlers that raise before conn.close() would otherwise leak a pool slot
+        if not getattr(self, '_released', True):
+            with self._pool._cond:
+                self._pool._reclaimed += 1
+            self.close()
+
+
+class ConnectionPool:
+    """Process-wide MySQL connection pool with overflow, timeout, pre-ping and recycling"""
+
+    def __init__(self, config, size=5, max_overflow=10, timeout=30.0, recycle=3600, pre_ping=True):
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._idle = collections.deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._checked_out = 0
+
+        self._checkouts = 0
+        self._connects = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._reclaimed = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    raw, created_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Pool limit of {self.size + self.max_overflow} connections reached, "
+                        f"timed out after {self.timeout}s"
+                    )
+                self._cond.wait(remaining)
+            self._checked_out += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            if raw is not None and not self._is_usable(raw, created_at):
+                raw = None
+            if raw is None:
+                raw = mysql.connector.connect(**self.config)
+                created_at = time.monotonic()
+                with self._cond:
+                    self._connects += 1
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, raw, created_at)
+
+    def _is_usable(self, raw, created_at):
+        if self.recycle >= 0 and time.monotonic() - created_at > self.recycle:
+            self._discard(raw)
+            with self._cond:
+                self._recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Error:
+                self._discard(raw)
+                with self._cond:
+                    self._invalidated += 1
+                return False
+        return True
+
+    def _release(self, raw, created_at, reuse=True):
+        healthy = reuse
+        if reuse:
+            try:
+                raw.consume_results()
+                if raw.in_transaction:
+                    raw.rollback()
+                if raw.autocommit != self.config.get('autocommit', False):
+                    raw.autocommit = self.config.get('autocommit', False)
+            except Error:
+                healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if healthy and self._open <= self.size:
+                self._idle.append((raw, created_at))
+                raw = None
+            else:
+                self._open -= 1
+                if not healthy:
+                    self._invalidated += 1
+            self._cond.notify()
+
+        if raw is not None:
+            self._discard(raw)
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Error:
+            pass
+
+    def dispose(self):
+        """Close all idle connections (checked-out ones are closed on release)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "timeout": self.timeout,
+                "recycle": self.recycle,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "overflow": max(0, self._open - self.size),
+                "checkouts": self._checkouts,
+                "connects": self._connects,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+                "reclaimed": self._reclaimed,
+                "avg_wait_ms": round(self._wait_time_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "max_wait_ms": round(self._wait_time_max * 1000, 3),
+            }
+
+
+pool = ConnectionPool(
+    DB_CONFIG,
+    size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    pre_ping=DB_POOL_PRE_PING,
+)
+
+
+def get_db_connection():
+    """Borrow a connection from the shared pool; conn.close() returns it"""
+    try:
+        return pool.acquire()
+    except PoolTimeout as e:
+        print(f"Error getting connection from pool: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Database is busy, please try again"
+        )
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database connection failed"
+        )
+
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+_db_inflight = 0
+_db_inflight_max = 0
+
+
+async def run_db(func, *args, **kwargs):
+    """Run blocking database work on the bounded DB executor so the event loop stays free
+
+    A UnitOfWork among the arguments gets its connection before a thread is
+    taken (see acquire_connection).
+    """
+    global _db_inflight, _db_inflight_max
+    for arg in args:
+        if isinstance(arg, UnitOfWork):
+            await arg.open()
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    _db_inflight += 1
+    _db_inflight_max = max(_db_inflight_max, _db_inflight)
+    try:
+        return await loop.run_in_executor(_db_executor, functools.partial(ctx.run, func, *args, **kwargs))
+    finally:
+        _db_inflight -= 1
+
+_db_slots = None
+
+
+def _connection_slots():
+    """Semaphore sized to the pool limit, recreated if a new event loop takes over (e.g. between test clients)"""
+    global _db_slots
+    loop = asyncio.get_running_loop()
+    if _db_slots is None or _db_slots[0] is not loop:
+        _db_slots = (loop, asyncio.Semaphore(pool.size + pool.max_overflow))
+    return _db_slots[1]
+
+
+async def acquire_connection():
+    """Borrow a connection from async code, waiting for a free pool slot on the event loop
+
+    For connections held across awaits (a request's UnitOfWork, a streamed
+    export). Waiting in pool.acquire() on a worker thread instead can park
+    every DB thread while the requests holding the connections wait for a
+    thread to finish on. Closing the connection frees its slot.
+    """
+    loop = asyncio.get_running_loop()
+    slots = _connection_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), pool.timeout)
+    except asyncio.TimeoutError:
+        print(f"Error getting connection from pool: no slot free after {pool.timeout}s")
+        raise HTTPException(
+            status_code=503,
+            detail="Database is busy, please try again"
+        )
+    try:
+        conn = await run_db(get_db_connection)
+    except BaseException:
+        slots.release()
+        raise
+    conn._on_release = functools.partial(loop.call_soon_threadsafe, slots.release)
+    return conn
+
+def ensure_index(cursor, table, index_name, definition):
+    """Add an index to an existing table unless it is already there; returns whether it was added
+
+    MySQL has no ADD INDEX IF NOT EXISTS, so this is check-then-act: a
+    concurrent run that wins the race makes ours fail with ER_DUP_KEYNAME,
+    which is taken as success.
+    """
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+    if cursor.fetchall():
+        return False
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+    except Error as e:
+        if e.errno != 1061:  # ER_DUP_KEYNAME
+            raise
+        return False
+    return True
+
+def ensure_column(cursor, table, column_name, definition):
+    """Add a column to an existing table unless it is already there (a concurrent add counts as there)"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column_name))
+    if cursor.fetchall():
+        return False
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+    except Error as e:
+        if e.errno != 1060:  # ER_DUP_FIELDNAME
+            raise
+        return False
+    return True
+
+class UnitOfWork:
+    """One pooled connection and transaction shared by everything a request touches
+
+    The connection is borrowed lazily on first use, so requests that never reach
+    the database (e.g. a cached user on a DB-less endpoint) cost no checkout.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._transactional = False
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = get_db_connection()
+        if not self._transactional:
+            self._conn.autocommit = False
+            self._transactional = True
+        return self._conn
+
+    async def open(self):
+        """Borrow the connection from the event loop; run_db does this before dispatching work"""
+        if self._conn is None:
+            self._conn = await acquire_connection()
+
+    def cursor(self, **kwargs):
+        return self.conn.cursor(**kwargs)
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn is not None:
+            self._conn.rollback()
+
+    def close(self):
+        """Return the connection to the pool; anything not committed is rolled back"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._transactional = False
+            conn.close()
+
+
+async def get_db():
+    """FastAPI dependency: the request's UnitOfWork, released when the request ends"""
+    db = UnitOfWork()
+    try:
+        yield db
+    finally:
+        # Requests that never borrowed a connection skip the executor hop
+        if db._conn is not None:
+            await run_db(db.close)
+
+def get_pool_stats():
+    stats = pool.stats()
+    stats["executor_workers"] = DB_EXECUTOR_WORKERS
+    stats["executor_inflight"] = _db_inflight
+    stats["executor_inflight_max"] = _db_inflight_max
+    return stats
@@ -0,0 +1,26 @@
+import hashlib
+from fastapi import Request, Response
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag for an already serialized response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def version_etag(*parts) -> str:
+    """Strong ETag from row-version values (ids, counts, updated_at...) that change with the payload"""
+    return body_etag(repr(parts).encode('utf-8'))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check, using the weak comparison RFC 9110 prescribes for it"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in header.split(','))
+
+
+def not_modified(etag: str, cache_control: str = "no-cache") -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -0,0 +1,131 @@
+import asyncio
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from db import DB_POOL_TIMEOUT, UnitOfWork, acquire_connection, run_db
+
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+# Each running export holds a pool connection for as long as its client keeps reading
+EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', 2))
+
+_export_slots = None
+
+
+def _export_semaphore():
+    """Semaphore capping concurrent exports, recreated if a new event loop takes over"""
+    global _export_slots
+    loop = asyncio.get_running_loop()
+    if _export_slots is None or _export_slots[0] is not loop:
+        _export_slots = (loop, asyncio.Semaphore(EXPORT_MAX_CONCURRENT))
+    return _export_slots[1]
+
+
+def _exports_busy():
+    return HTTPException(status_code=503, detail="Too many exports running, please try again later")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    return value
+
+
+def _encode_batch(rows, fmt, columns, with_header):
+    if fmt == 'ndjson':
+        return "".join(json.dumps(row, default=_json_default) + "\n" for row in rows)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if with_header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(row[column]) for column in columns])
+    return out.getvalue()
+
+
+async def _stream(query, params, fmt, transform):
+    slots = _export_semaphore()
+    # Taken here rather than in stream_export so a response that never starts cannot leak the slot
+    try:
+        await asyncio.wait_for(slots.acquire(), DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise _exports_busy()
+    rows = _stream_rows(query, params, fmt, transform)
+    try:
+        async for chunk in rows:
+            yield chunk
+    finally:
+        try:
+            await rows.aclose()
+        finally:
+            slots.release()
+
+
+async def _stream_rows(query, params, fmt, transform):
+    conn = await acquire_connection()
+    finished = False
+    try:
+        # Unbuffered: rows are pulled from the server batch by batch, never held in full
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        await run_db(cursor.execute, query, params)
+        columns = list(cursor.column_names)
+        first = True
+        while True:
+            rows = await run_db(cursor.fetchmany, EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            if transform:
+                for row in rows:
+                    transform(row)
+            yield _encode_batch(rows, fmt, columns, first).encode('utf-8')
+            first = False
+        if first and fmt == 'csv':
+            yield _encode_batch([], fmt, columns, True).encode('utf-8')
+        finished = True
+        cursor.close()
+    finally:
+        if finished:
+            await run_db(conn.close)
+        else:
+            # The client went away mid-stream; reading out the rest just to reuse the connection could take minutes
+            await run_db(conn.invalidate)
+
+
+async def stream_export(query, params, fmt, filename, transform=None, db: UnitOfWork = None):
+    """StreamingResponse of a query's rows as NDJSON or CSV, read through an unbuffered cursor
+
+    Memory stays at one batch of EXPORT_BATCH_SIZE rows however large the
+    result. transform(row) may adjust each row dict in place before encoding.
+    At most EXPORT_MAX_CONCURRENT exports run at once; more get a 503.
+    db is the request's UnitOfWork (e.g. the one auth used): it is released
+    here, since dependency teardown would only run after the whole stream.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}")
+    if db is not None and db._conn is not None:
+        await run_db(db.close)
+    if _export_semaphore().locked():
+        raise _exports_busy()
+    return StreamingResponse(
+        _stream(query, params, fmt, transform),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,54 @@
+import threading
+from collections import Counter
+
+
+class ListingFacets:
+    """Active-listing counts per (category, condition), maintained as deltas on listing writes
+
+    Memory and read cost are O(categories x conditions), independent of catalog size.
+    Each process applies its own writes immediately; a periodic rebuild from a
+    GROUP BY picks up writes made by other worker processes.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def rebuild(self, rows):
+        """rows: (category, condition, count) triples from a GROUP BY over active listings"""
+        counts = Counter()
+        for category, condition, count in rows:
+            counts[(category, condition)] += count
+        with self._lock:
+            self._counts = counts
+            self.ready = True
+
+    def apply(self, before=None, after=None):
+        """Move one listing between buckets; before/after are row dicts or None (absent or inactive)"""
+        with self._lock:
+            if before is not None:
+                key = (before['category'], before['condition_type'])
+                self._counts[key] -= 1
+                if self._counts[key] <= 0:
+                    del self._counts[key]
+            if after is not None:
+                self._counts[(after['category'], after['condition_type'])] += 1
+
+    def snapshot(self, category=None):
+        with self._lock:
+            counts = list(self._counts.items())
+        categories = Counter()
+        conditions = Counter()
+        for (cat, condition), count in counts:
+            categories[cat] += count
+            if category is None or cat == category:
+                conditions[condition] += count
+        return {
+            "categories": dict(categories),
+            "conditions": dict(conditions),
+            "total": sum(categories.values()),
+        }
+
+
+listing_facets = ListingFacets()
@@ -0,0 +1,43 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib fallback still skips jsonable_encoder
+    orjson = None
+
+
+def _default(value):
+    """Types MySQL rows carry that the encoders do not handle natively, encoded like jsonable_encoder does"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for plain dict/list payloads that skips jsonable_encoder
+
+    Endpoints opt in by returning FastJSONResponse(payload) themselves, which
+    also bypasses response_model validation, so the payload must already be
+    in its final shape. Uses orjson when installed, the json module otherwise.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,102 @@
+import csv
+import json
+
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+
+async def aiter_lines(chunks):
+    """Split an async stream of byte chunks into decoded lines (endings kept), without buffering the body"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode('utf-8') + "\n"
+    if pending:
+        yield pending.decode('utf-8')
+
+
+class RowParser:
+    """Incremental NDJSON/CSV parser: feed lines, get back (row_number, data, error) records
+
+    data is a dict of raw field values for ListingCreate, error a message
+    when the row could not be parsed. CSV records may span lines inside
+    quoted fields; they are held back until their quotes balance.
+    """
+
+    def __init__(self, fmt):
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(IMPORT_FORMATS)}")
+        self.fmt = fmt
+        self.row_number = 0
+        self._header = None
+        self._pending = ""
+
+    def feed(self, line):
+        if self.fmt == 'ndjson':
+            return self._feed_ndjson(line)
+        return self._feed_csv(line)
+
+    def close(self):
+        """Flush a trailing unterminated CSV record"""
+        if self.fmt == 'csv' and self._pending.strip():
+            pending, self._pending = self._pending, ""
+            return self._csv_record(pending)
+        return []
+
+    def _feed_ndjson(self, line):
+        if not line.strip():
+            return []
+        self.row_number += 1
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            return [(self.row_number, None, f"Invalid JSON: {e.msg}")]
+        if not isinstance(data, dict):
+            return [(self.row_number, None, "Row must be a JSON object")]
+        return [(self.row_number, data, None)]
+
+    def _feed_csv(self, line):
+        self._pending += line
+        if self._pending.count('"') % 2:
+            return []
+        pending, self._pending = self._pending, ""
+        if not pending.strip():
+            return []
+        return self._csv_record(pending)
+
+    def _csv_record(self, text):
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            self.row_number += 1
+            return [(self.row_number, None, f"Invalid CSV: {e}")]
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return []
+        self.row_number += 1
+        if len(values) != len(self._header):
+            return [(self.row_number, None, f"Expected {len(self._header)} columns, got {len(values)}")]
+        data = {name: value for name, value in zip(self._header, values) if value != ''}
+        if 'images' in data:
+            data['images'] = _csv_images(data['images'])
+        return [(self.row_number, data, None)]
+
+
+def _csv_images(value):
+    """images cell: a JSON array, or URLs separated by |"""
+    value = value.strip()
+    if value.startswith('['):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return [url.strip() for url in value.split('|') if url.strip()]
+
+
+def validation_message(error):
+    """One-line summary of a pydantic ValidationError"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
@@ -1,15 +1,21 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, EmailStr
-import bcrypt
+from pydantic import BaseModel, EmailStr, Field, model_validator
 import jwt as pyjwt
 from datetime import datetime, timedelta
 import mysql.connector
 from mysql.connector import Error
 import os
-from typing import Optional
+from typing import Literal, Optional
 from dotenv import load_dotenv
+from db import UnitOfWork, get_db, get_db_connection, get_pool_stats, run_db
+from auth import (
+    SECRET_KEY, ALGORITHM, get_current_user, hash_password, verify_password,
+    run_bcrypt, get_bcrypt_stats, get_user_cache_stats,
+)
+from etag import etag_matches, not_modified, version_etag
+from fast_json import FastJSONResponse
+from compression import COMPRESSION_ENABLED, CompressionMiddleware
 from dashboard import router as dashboard_router
 from checkout import router as checkout_router
 
@@ -23,39 +29,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
 
 
 app.include_router(dashboard_router)
 app.include_router(checkout_router)
 
-SECRET_KEY = os.getenv('SECRET_KEY',)
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-security = HTTPBearer()
-
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': int(os.getenv('DB_PORT', 3306)),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', ''),
-    'database': os.getenv('DB_NAME', 'ecofinds_db'),
-    'charset': 'utf8mb4',
-    'autocommit': True
-}
-
-def get_db_connection():
-    
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="Database connection failed"
-        )
+# Per-user responses: browsers may keep them but must revalidate with If-None-Match every time
+PRIVATE_CACHE_CONTROL = "private, no-cache"
 
 def init_db():
     
@@ -137,6 +122,20 @@ class CartItemUpdate(BaseModel):
 class CartItemRemove(BaseModel):
     product_id: int
 
+class CartOperation(BaseModel):
+    op: Literal['add', 'update', 'remove']
+    product_id: int
+    quantity: int = Field(1, ge=0)
+
+    @model_validator(mode='after')
+    def check_add_quantity(self):
+        if self.op == 'add' and self.quantity < 1:
+            raise ValueError("add needs a quantity of at least 1")
+        return self
+
+class CartBatch(BaseModel):
+    operations: list[CartOperation]
+
 class CartItem(BaseModel):
     id: int
     product_id: int
@@ -153,20 +152,9 @@ class CartResponse(BaseModel):
     items_count: int
 
 
-def hash_password(password: str) -> str:
-    
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-def get_user_by_email(email: str):
+def get_user_by_email(db: UnitOfWork, email: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         cursor.execute("""
             SELECT id, email, password_hash, name, created_at, is_active 
             FROM users 
@@ -174,7 +162,6 @@ def get_user_by_email(email: str):
         """, (email,))
         user = cursor.fetchone()
         cursor.close()
-        conn.close()
         
         
         if user and user.get('created_at'):
@@ -185,10 +172,9 @@ def get_user_by_email(email: str):
         print(f"Error getting user by email: {e}")
         return None
 
-def get_all_users():
+def get_all_users(db: UnitOfWork):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor(dictionary=True)
         cursor.execute("""
             SELECT id, email, name, created_at, is_active 
             FROM users 
@@ -197,7 +183,6 @@ def get_all_users():
         """)
         users = cursor.fetchall()
         cursor.close()
-        conn.close()
         
         
         for user in users:
@@ -209,25 +194,21 @@ def get_all_users():
         print(f"Error getting all users: {e}")
         return []
 
-def get_user_count():
+def get_user_count(db: UnitOfWork):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         cursor.execute("SELECT COUNT(*) FROM users WHERE is_active = TRUE")
         count = cursor.fetchone()[0]
         cursor.close()
-        conn.close()
         return count
     except Error as e:
         print(f"Error getting user count: {e}")
         return 0
 
-def create_user(user_data: UserCreate):
+def create_user(db: UnitOfWork, user_data: UserCreate, hashed_password: str):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
-        hashed_password = hash_password(user_data.password)
         cursor.execute(
             "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)",
             (user_data.name, user_data.email, hashed_password)
@@ -240,8 +221,8 @@ def create_user(user_data: UserCreate):
             (user_id,)
         )
         user = cursor.fetchone()
+        db.commit()
         cursor.close()
-        conn.close()
         
         return {
             "id": user[0], 
@@ -251,63 +232,31 @@ def create_user(user_data: UserCreate):
             "is_active": user[4]
         }
     except mysql.connector.IntegrityError:
-        if conn:
-            cursor.close()
-            conn.close()
+        db.rollback()
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     except Error as e:
-        if conn:
-            cursor.close()
-            conn.close()
+        db.rollback()
         print(f"Error creating user: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to create user"
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    
-    token = credentials.credentials
-    try:
-        payload = pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    except pyjwt.PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_email(email)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user
-
-
 @app.post("/api/register", response_model=dict)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, db: UnitOfWork = Depends(get_db)):
     """Register a new user"""
-    user = create_user(user_data)
+    hashed_password = await run_bcrypt(hash_password, user_data.password)
+    user = await run_db(create_user, db, user_data, hashed_password)
     return {"message": "User created successfully", "user": user}
 
 @app.post("/api/login", response_model=Token)
-async def login(user_credentials: UserLogin):
+async def login(user_credentials: UserLogin, db: UnitOfWork = Depends(get_db)):
     """Authenticate user and return access token"""
-    user = get_user_by_email(user_credentials.email)
-    if not user or not verify_password(user_credentials.password, user["password_hash"]):
+    user = await run_db(get_user_by_email, db, user_credentials.email)
+    if not user or not await run_bcrypt(verify_password, user_credentials.password, user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -322,8 +271,14 @@ async def login(user_credentials: UserLogin):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/api/profile", response_model=User)
-async def get_profile(current_user: dict = Depends(get_current_user)):
+async def get_profile(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
     
+    etag = version_etag("profile", current_user["id"], current_user["name"], current_user["email"],
+                        str(current_user.get("created_at")), current_user["is_active"])
+    if etag_matches(request, etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
     return {
         "id": current_user["id"],
         "name": current_user["name"],
@@ -333,68 +288,133 @@ async def get_profile(current_user: dict = Depends(get_current_user)):
     }
 
 @app.get("/api/users/count")
-async def get_users_count():
+async def get_users_count(db: UnitOfWork = Depends(get_db)):
     
-    count = get_user_count()
+    count = await run_db(get_user_count, db)
     return {"total_users": count}
 
 @app.get("/api/users")
-async def get_users(current_user: dict = Depends(get_current_user)):
+async def get_users(current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
     
-    users = get_all_users()
-    return {"users": users}
+    users = await run_db(get_all_users, db)
+    return FastJSONResponse({"users": users})
+
+@app.get("/api/db/pool")
+async def get_db_pool_stats():
+    """Connection pool statistics for sizing DB_POOL_SIZE / DB_POOL_MAX_OVERFLOW"""
+    return get_pool_stats()
+
+@app.get("/api/auth/hasher")
+async def get_hasher_stats():
+    """bcrypt worker pool statistics (queue wait and hash time)"""
+    return get_bcrypt_stats()
+
+@app.get("/api/auth/user-cache")
+async def get_user_cache_statistics():
+    """Hit/miss counters for the resolved-user cache used by get_current_user"""
+    return get_user_cache_stats()
+
 
+def get_cart_version(db: UnitOfWork, user_id: int):
+    """Row versions behind a user's cart payload; changes whenever get_cart_items would return something else
 
-def get_cart_items(user_id: int):
+    updated_at only has one-second resolution, so the per-line checksum is
+    what tells apart two same-second writes that keep count and sum (e.g. a
+    batch moving quantity from one line to another).
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = db.cursor()
         cursor.execute("""
-            SELECT ci.id, ci.listing_id as product_id, ci.quantity, ci.created_at,
-                   l.title, l.price, l.images, u.name as seller_name
+            SELECT COUNT(*), COALESCE(SUM(ci.quantity), 0), MAX(ci.id), MAX(ci.updated_at),
+                   MAX(l.updated_at), MAX(u.updated_at),
+                   BIT_XOR(CRC32(CONCAT_WS(',', ci.id, ci.quantity, ci.updated_at)))
             FROM cart_items ci
             LEFT JOIN listings l ON ci.listing_id = l.id
             LEFT JOIN users u ON l.user_id = u.id
             WHERE ci.user_id = %s
-            ORDER BY ci.created_at DESC
         """, (user_id,))
+        version = cursor.fetchone()
+        cursor.close()
+        return tuple(str(part) for part in version)
+    except Error as e:
+        print(f"Error getting cart version: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get cart")
+
+CART_ITEM_SELECT = """
+            SELECT ci.id, ci.listing_id as product_id, ci.quantity, ci.created_at,
+                   l.title, l.price, l.primary_image, u.name as seller_name
+            FROM cart_items ci
+            LEFT JOIN listings l ON ci.listing_id = l.id
+            LEFT JOIN users u ON l.user_id = u.id
+            WHERE ci.user_id = %s
+"""
+
+def _cart_item(item: dict):
+    return {
+        "id": item['id'],
+        "product_id": item['product_id'],
+        "quantity": item['quantity'],
+        "title": item['title'] or "Unknown Product",
+        "price": float(item['price']) if item['price'] else 0.0,
+        "image": item['primary_image'],
+        "seller_name": item['seller_name'] or "Unknown Seller",
+        "created_at": str(item['created_at'])
+    }
+
+def get_cart_items(db: UnitOfWork, user_id: int):
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(CART_ITEM_SELECT + " ORDER BY ci.created_at DESC", (user_id,))
         items = cursor.fetchall()
         cursor.close()
-        conn.close()
-        
-        
-        cart_items = []
-        for item in items:
-            
-            image = None
-            if item.get('images'):
-                try:
-                    images = item['images'] if isinstance(item['images'], list) else eval(item['images'])
-                    if images and len(images) > 0:
-                        image = images[0]
-                except:
-                    pass
-            
-            cart_items.append({
-                "id": item['id'],
-                "product_id": item['product_id'],
-                "quantity": item['quantity'],
-                "title": item['title'] or "Unknown Product",
-                "price": float(item['price']) if item['price'] else 0.0,
-                "image": image,
-                "seller_name": item['seller_name'] or "Unknown Seller",
-                "created_at": str(item['created_at'])
-            })
         
-        return cart_items
+        return [_cart_item(item) for item in items]
     except Error as e:
         print(f"Error getting cart items: {e}")
         return []
 
-def add_to_cart(user_id: int, product_id: int, quantity: int = 1):
+def get_cart_line(db: UnitOfWork, user_id: int, product_id: int):
+    """The one cart line for a listing, or None when it is not in the cart"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(CART_ITEM_SELECT + " AND ci.listing_id = %s", (user_id, product_id))
+        item = cursor.fetchone()
+        cursor.close()
+        
+        return _cart_item(item) if item else None
+    except Error as e:
+        print(f"Error getting cart item: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get cart")
+
+def get_cart_summary(db: UnitOfWork, user_id: int):
+    """Cart total and item count from one aggregate, without fetching the lines"""
+    try:
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT COALESCE(SUM(ci.quantity * l.price), 0), COALESCE(SUM(ci.quantity), 0)
+            FROM cart_items ci
+            LEFT JOIN listings l ON ci.listing_id = l.id
+            WHERE ci.user_id = %s
+        """, (user_id,))
+        total, items_count = cursor.fetchone()
+        cursor.close()
+        
+        return {"total": float(total), "items_count": int(items_count)}
+    except Error as e:
+        print(f"Error getting cart summary: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get cart")
+
+def get_cart(db: UnitOfWork, user_id: int):
+    return {"items": get_cart_items(db, user_id), **get_cart_summary(db, user_id)}
+
+def get_cart_delta(db: UnitOfWork, user_id: int, product_id: int):
+    """Lean mutation response: the changed line (None once removed) plus fresh totals"""
+    return {"product_id": product_id, "item": get_cart_line(db, user_id, product_id),
+            **get_cart_summary(db, user_id)}
+
+def add_to_cart(db: UnitOfWork, user_id: int, product_id: int, quantity: int = 1):
+    try:
+        cursor = db.cursor()
         
         
         cursor.execute("""
@@ -417,18 +437,16 @@ def add_to_cart(user_id: int, product_id: int, quantity: int = 1):
                 VALUES (%s, %s, %s)
             """, (user_id, product_id, quantity))
         
-        conn.commit()
+        db.commit()
         cursor.close()
-        conn.close()
         return True
     except Error as e:
         print(f"Error adding to cart: {e}")
         return False
 
-def update_cart_item(user_id: int, product_id: int, quantity: int):
+def update_cart_item(db: UnitOfWork, user_id: int, product_id: int, quantity: int):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         if quantity <= 0:
             
@@ -444,124 +462,182 @@ def update_cart_item(user_id: int, product_id: int, quantity: int):
                 WHERE user_id = %s AND listing_id = %s
             """, (quantity, user_id, product_id))
         
-        conn.commit()
+        db.commit()
         cursor.close()
-        conn.close()
         return True
     except Error as e:
         print(f"Error updating cart item: {e}")
         return False
 
-def remove_from_cart(user_id: int, product_id: int):
+def remove_from_cart(db: UnitOfWork, user_id: int, product_id: int):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         cursor.execute("""
             DELETE FROM cart_items 
             WHERE user_id = %s AND listing_id = %s
         """, (user_id, product_id))
         
-        conn.commit()
+        db.commit()
         cursor.close()
-        conn.close()
         return True
     except Error as e:
         print(f"Error removing from cart: {e}")
         return False
 
-def clear_cart(user_id: int):
+def clear_cart(db: UnitOfWork, user_id: int):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         cursor.execute("""
             DELETE FROM cart_items WHERE user_id = %s
         """, (user_id,))
         
-        conn.commit()
+        db.commit()
         cursor.close()
-        conn.close()
         return True
     except Error as e:
         print(f"Error clearing cart: {e}")
         return False
 
+CART_BATCH_MAX_OPERATIONS = int(os.getenv('CART_BATCH_MAX_OPERATIONS', 100))
+CART_ITEM_UPSERT = """
+            INSERT INTO cart_items (user_id, listing_id, quantity) VALUES {rows}
+            ON DUPLICATE KEY UPDATE quantity = {quantity}, updated_at = CURRENT_TIMESTAMP
+"""
+
+def fold_cart_operations(operations: list[CartOperation]):
+    """Net effect of a batch per listing, applying ops in order
+
+    Each listing ends up as ('add', n) to increment its line, ('set', n) to
+    replace its quantity or ('remove', 0), so a batch costs at most one
+    statement of each kind however many ops touch the same listing.
+    """
+    net = {}
+    for operation in operations:
+        kind, quantity = operation.op, operation.quantity
+        if kind == 'update' and quantity <= 0:
+            kind = 'remove'
+        previous = net.get(operation.product_id)
+        if kind == 'remove':
+            net[operation.product_id] = ('remove', 0)
+        elif kind == 'update':
+            net[operation.product_id] = ('set', quantity)
+        elif previous is None:
+            net[operation.product_id] = ('add', quantity)
+        elif previous[0] == 'remove':
+            net[operation.product_id] = ('set', quantity)
+        else:
+            net[operation.product_id] = (previous[0], previous[1] + quantity)
+    return net
+
+def apply_cart_operations(db: UnitOfWork, user_id: int, operations: list[CartOperation]):
+    """Apply a batch in one transaction: one DELETE plus multi-row upserts on unique_user_listing"""
+    net = fold_cart_operations(operations)
+    removed = [product_id for product_id, (kind, _) in net.items() if kind == 'remove']
+    upserts = (
+        ([(user_id, product_id, quantity) for product_id, (kind, quantity) in net.items() if kind == 'add'],
+         "quantity + VALUES(quantity)"),
+        ([(user_id, product_id, quantity) for product_id, (kind, quantity) in net.items() if kind == 'set'],
+         "VALUES(quantity)"),
+    )
+    try:
+        cursor = db.cursor()
+        
+        if removed:
+            placeholders = ", ".join(["%s"] * len(removed))
+            cursor.execute(f"""
+                DELETE FROM cart_items
+                WHERE user_id = %s AND listing_id IN ({placeholders})
+            """, (user_id, *removed))
+        for rows, quantity in upserts:
+            if rows:
+                cursor.execute(
+                    CART_ITEM_UPSERT.format(rows=", ".join(["(%s, %s, %s)"] * len(rows)), quantity=quantity),
+                    [value for row in rows for value in row],
+                )
+        
+        db.commit()
+        cursor.close()
+    except mysql.connector.IntegrityError as e:
+        db.rollback()
+        if e.errno == 1452:  # foreign key: no such listing
+            raise HTTPException(status_code=400, detail="One or more listings do not exist")
+        print(f"Error applying cart operations: {e}")
+        raise HTTPException(status_code=500, detail="Failed to apply cart operations")
+    except Error as e:
+        db.rollback()
+        print(f"Error applying cart operations: {e}")
+        raise HTTPException(status_code=500, detail="Failed to apply cart operations")
+
+
+async def cart_after_mutation(db: UnitOfWork, user_id: int, product_id: int, lean: bool):
+    """Mutation responses: the whole cart, or with lean=true only the changed line and totals"""
+    if lean:
+        return await run_db(get_cart_delta, db, user_id, product_id)
+    return await run_db(get_cart, db, user_id)
 
 @app.get("/api/cart", response_model=CartResponse)
-async def get_cart(current_user: dict = Depends(get_current_user)):
-    """Get user's cart items"""
-    items = get_cart_items(current_user["id"])
-    total = sum(item["price"] * item["quantity"] for item in items)
-    items_count = sum(item["quantity"] for item in items)
+async def get_cart_endpoint(request: Request, response: Response, current_user: dict = Depends(get_current_user),
+                            db: UnitOfWork = Depends(get_db)):
+    """Get user's cart items (If-None-Match with the last ETag answers 304 after a version check only)"""
+    version = await run_db(get_cart_version, db, current_user["id"])
+    etag = version_etag("cart", current_user["id"], *version)
+    if etag_matches(request, etag):
+        return not_modified(etag, PRIVATE_CACHE_CONTROL)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = PRIVATE_CACHE_CONTROL
     
-    return {
-        "items": items,
-        "total": total,
-        "items_count": items_count
-    }
+    return await run_db(get_cart, db, current_user["id"])
 
 @app.post("/api/cart/add")
-async def add_cart_item(item: CartItemAdd, current_user: dict = Depends(get_current_user)):
-    """Add item to cart"""
-    success = add_to_cart(current_user["id"], item.product_id, item.quantity)
+async def add_cart_item(item: CartItemAdd, lean: bool = False, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Add item to cart (lean=true returns only the changed line and totals)"""
+    success = await run_db(add_to_cart, db, current_user["id"], item.product_id, item.quantity)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to add item to cart")
     
    
-    items = get_cart_items(current_user["id"])
-    total = sum(item["price"] * item["quantity"] for item in items)
-    items_count = sum(item["quantity"] for item in items)
-    
-    return {
-        "message": "Item added to cart successfully",
-        "items": items,
-        "total": total,
-        "items_count": items_count
-    }
+    return {"message": "Item added to cart successfully", **await cart_after_mutation(db, current_user["id"], item.product_id, lean)}
 
 @app.put("/api/cart/update")
-async def update_cart_item_endpoint(item: CartItemUpdate, current_user: dict = Depends(get_current_user)):
-    """Update cart item quantity"""
-    success = update_cart_item(current_user["id"], item.product_id, item.quantity)
+async def update_cart_item_endpoint(item: CartItemUpdate, lean: bool = False, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Update cart item quantity (lean=true returns only the changed line and totals)"""
+    success = await run_db(update_cart_item, db, current_user["id"], item.product_id, item.quantity)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to update cart item")
     
   
-    items = get_cart_items(current_user["id"])
-    total = sum(item["price"] * item["quantity"] for item in items)
-    items_count = sum(item["quantity"] for item in items)
-    
-    return {
-        "message": "Cart updated successfully",
-        "items": items,
-        "total": total,
-        "items_count": items_count
-    }
+    return {"message": "Cart updated successfully", **await cart_after_mutation(db, current_user["id"], item.product_id, lean)}
 
 @app.delete("/api/cart/remove")
-async def remove_cart_item(item: CartItemRemove, current_user: dict = Depends(get_current_user)):
-    """Remove item from cart"""
-    success = remove_from_cart(current_user["id"], item.product_id)
+async def remove_cart_item(item: CartItemRemove, lean: bool = False, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Remove item from cart (lean=true returns only the removed line's id and totals)"""
+    success = await run_db(remove_from_cart, db, current_user["id"], item.product_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to remove item from cart")
     
     
-    items = get_cart_items(current_user["id"])
-    total = sum(item["price"] * item["quantity"] for item in items)
-    items_count = sum(item["quantity"] for item in items)
+    return {"message": "Item removed from cart successfully", **await cart_after_mutation(db, current_user["id"], item.product_id, lean)}
+
+@app.post("/api/cart/batch", response_model=CartResponse)
+async def cart_batch(batch: CartBatch, current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
+    """Apply add/update/remove operations atomically and return the final cart once
+
+    add increments a line, update sets its quantity (adding the line if it is
+    missing, removing it at 0) and remove deletes it; ops apply in order.
+    """
+    if len(batch.operations) > CART_BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {CART_BATCH_MAX_OPERATIONS} operations per batch")
     
-    return {
-        "message": "Item removed from cart successfully",
-        "items": items,
-        "total": total,
-        "items_count": items_count
-    }
+    if batch.operations:
+        await run_db(apply_cart_operations, db, current_user["id"], batch.operations)
+    return await run_db(get_cart, db, current_user["id"])
 
 @app.delete("/api/cart/clear")
-async def clear_user_cart(current_user: dict = Depends(get_current_user)):
+async def clear_user_cart(current_user: dict = Depends(get_current_user), db: UnitOfWork = Depends(get_db)):
     """Clear user's cart"""
-    success = clear_cart(current_user["id"])
+    success = await run_db(clear_cart, db, current_user["id"])
     if not success:
         raise HTTPException(status_code=500, detail="Failed to clear cart")
     
@@ -0,0 +1,63 @@
+"""Maintenance commands, run from the backend directory: python manage.py <command> --help"""
+import argparse
+import json
+import sys
+
+
+def migrate(args):
+    from dashboard import migrate_dashboard_indexes
+    added = migrate_dashboard_indexes()
+    print(f"Added {len(added)} indexes" if added else "All indexes present")
+
+
+def backfill_primary_images(args):
+    from dashboard import backfill_primary_images
+    updated = backfill_primary_images(batch_size=args.batch_size)
+    print(f"Backfilled primary_image for {updated} listings")
+
+
+def import_listings(args):
+    from dashboard import import_listing_lines
+    from db import UnitOfWork
+    fmt = args.format or ('csv' if args.file.endswith('.csv') else 'ndjson')
+    db = UnitOfWork()
+    try:
+        if args.file == '-':
+            report = import_listing_lines(db, sys.stdin, fmt, args.user_id, args.chunk_size)
+        else:
+            with open(args.file, encoding='utf-8', newline='') as lines:
+                report = import_listing_lines(db, lines, fmt, args.user_id, args.chunk_size)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migration = commands.add_parser("migrate",
+                                    help="Add missing indexes to existing tables (run once per deploy)")
+    migration.set_defaults(handler=migrate)
+
+    backfill = commands.add_parser("backfill-primary-images",
+                                   help="Fill listings.primary_image from the images column")
+    backfill.add_argument("--batch-size", type=int, default=500)
+    backfill.set_defaults(handler=backfill_primary_images)
+
+    importer = commands.add_parser("import-listings",
+                                   help="Bulk-create listings from an NDJSON or CSV file")
+    importer.add_argument("file", help="path to the file, or - for stdin")
+    importer.add_argument("--user-id", type=int, required=True, help="owner of the imported listings")
+    importer.add_argument("--format", choices=("ndjson", "csv"),
+                          help="defaults to csv for *.csv files, ndjson otherwise")
+    importer.add_argument("--chunk-size", type=int, default=None,
+                          help="rows per INSERT/transaction (default LISTINGS_IMPORT_CHUNK)")
+    importer.set_defaults(handler=import_listings)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor pointing just past the row with this (created_at, id)"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat(sep=' ')
+    raw = json.dumps([str(created_at), row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return str(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_condition(alias: str, cursor: str):
+    """WHERE fragment and params that seek past the cursor in (created_at DESC, id DESC) order"""
+    created_at, row_id = decode_cursor(cursor)
+    condition = (f"({alias}.created_at < %s OR ({alias}.created_at = %s AND {alias}.id < %s))")
+    return condition, [created_at, created_at, row_id]
+
+def page_size(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def paginate(rows, limit):
+    """Trim a limit+1 fetch to one page and build the cursor for the next one"""
+    if len(rows) <= limit or limit < 1:
+        return rows[:max(limit, 0)], None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last['created_at'], last['id'])
+
+def fetch_page(cursor, query, params, alias, limit=None, after=None):
+    """Run a query (ending in its WHERE clause) newest-first, as one keyset page when limit/after is given
+
+    Without limit or after every row is returned, as before pagination existed.
+    """
+    params = list(params)
+    if after:
+        condition, condition_params = keyset_condition(alias, after)
+        query += f" AND {condition}"
+        params.extend(condition_params)
+    query += f" ORDER BY {alias}.created_at DESC, {alias}.id DESC"
+    if limit is None and not after:
+        cursor.execute(query, params)
+        return cursor.fetchall(), None
+
+    size = page_size(limit)
+    cursor.execute(query + " LIMIT %s", params + [size + 1])
+    return paginate(cursor.fetchall(), size)
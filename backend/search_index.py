@@ -0,0 +1,274 @@
+import heapq
+import itertools
+import math
+import re
+import threading
+from collections import Counter
+
+
+TOKEN_RE = re.compile(r"\w+")
+TITLE_WEIGHT = 2
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class ListingSearchIndex:
+    """In-memory inverted index over active listings, ranked with Okapi BM25
+
+    Each process keeps its own copy: it is built from the listings table at
+    startup and kept current by the listing write endpoints of this process.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_lengths = {}
+        self._doc_terms = {}
+        self._doc_category = {}
+        self._category_docs = {}
+        self._total_length = 0
+
+    def _document_terms(self, listing):
+        terms = Counter()
+        for token in tokenize(listing.get('title')):
+            terms[token] += TITLE_WEIGHT
+        for field in ('description', 'category', 'location'):
+            terms.update(tokenize(listing.get(field)))
+        return terms
+
+    def add(self, listing):
+        """Index (or re-index) one listing dict with id, title, description, category, location"""
+        listing_id = listing['id']
+        terms = self._document_terms(listing)
+        category = listing.get('category')
+        with self._lock:
+            self._remove_locked(listing_id)
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[listing_id] = tf
+            length = sum(terms.values())
+            self._doc_terms[listing_id] = list(terms)
+            self._doc_lengths[listing_id] = length
+            self._total_length += length
+            self._doc_category[listing_id] = category
+            self._category_docs.setdefault(category, set()).add(listing_id)
+
+    def remove(self, listing_id):
+        with self._lock:
+            self._remove_locked(listing_id)
+
+    def _remove_locked(self, listing_id):
+        terms = self._doc_terms.pop(listing_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(listing_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(listing_id)
+        category = self._doc_category.pop(listing_id)
+        docs = self._category_docs.get(category)
+        if docs is not None:
+            docs.discard(listing_id)
+            if not docs:
+                del self._category_docs[category]
+
+    def rebuild(self, listings):
+        """Build a fresh index off to the side, then swap it in so searches never wait on a rebuild"""
+        fresh = ListingSearchIndex(self.k1, self.b)
+        for listing in listings:
+            fresh.add(listing)
+        with self._lock:
+            self._postings = fresh._postings
+            self._doc_lengths = fresh._doc_lengths
+            self._doc_terms = fresh._doc_terms
+            self._doc_category = fresh._doc_category
+            self._category_docs = fresh._category_docs
+            self._total_length = fresh._total_length
+            self.ready = True
+
+    def search(self, query, category=None, limit=50, offset=0):
+        """Return ([(listing_id, score), ...] for the requested page, total matches)"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_lengths)
+            if not terms or not n_docs:
+                return [], 0
+            allowed = None
+            if category:
+                allowed = self._category_docs.get(category)
+                if not allowed:
+                    return [], 0
+
+            avg_length = self._total_length / n_docs
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                if allowed is not None:
+                    # Posting-list intersection: walk whichever side is smaller
+                    if len(allowed) < len(postings):
+                        matches = [(doc, postings[doc]) for doc in allowed if doc in postings]
+                    else:
+                        matches = [(doc, tf) for doc, tf in postings.items() if doc in allowed]
+                else:
+                    matches = postings.items()
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc, tf in matches:
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc] / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return top[offset:offset + limit], len(scores)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._doc_lengths),
+                "terms": len(self._postings),
+                "categories": len(self._category_docs),
+            }
+
+
+def trigrams(word):
+    """Character trigrams of one word, padded like pg_trgm so word starts weigh more"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class TrigramIndex:
+    """Typo-tolerant title matching over active listings using a trigram inverted index
+
+    Candidates are the titles sharing the most trigrams with the query (at
+    most max_candidates of them); only those are scored word by word.
+    Posting lists are walked rarest trigram first and at most max_postings
+    entries are visited per query, so common trigrams ("pho", " ip") that
+    cover much of the catalog cannot make a query cost O(catalog).
+    """
+
+    def __init__(self, max_candidates=200, min_similarity=0.2, max_postings=20000):
+        self.max_candidates = max_candidates
+        self.min_similarity = min_similarity
+        self.max_postings = max_postings
+        self.postings_visited = 0
+        self.truncated_queries = 0
+        self.ready = False
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_words = {}
+        self._doc_category = {}
+
+    def _word_trigrams(self, title):
+        return [trigrams(word) for word in set(tokenize(title))]
+
+    def add(self, listing):
+        """Index (or re-index) one listing dict with id, title, category"""
+        listing_id = listing['id']
+        words = self._word_trigrams(listing.get('title'))
+        with self._lock:
+            self._remove_locked(listing_id)
+            for gram in set().union(*words):
+                self._postings.setdefault(gram, set()).add(listing_id)
+            self._doc_words[listing_id] = words
+            self._doc_category[listing_id] = listing.get('category')
+
+    def remove(self, listing_id):
+        with self._lock:
+            self._remove_locked(listing_id)
+
+    def _remove_locked(self, listing_id):
+        words = self._doc_words.pop(listing_id, None)
+        if words is None:
+            return
+        self._doc_category.pop(listing_id, None)
+        for gram in set().union(*words):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(listing_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def rebuild(self, listings):
+        fresh = TrigramIndex(self.max_candidates, self.min_similarity, self.max_postings)
+        for listing in listings:
+            fresh.add(listing)
+        with self._lock:
+            self._postings = fresh._postings
+            self._doc_words = fresh._doc_words
+            self._doc_category = fresh._doc_category
+            self.ready = True
+
+    def search(self, query, category=None, limit=50, offset=0):
+        """Return ([(listing_id, similarity), ...] for the requested page, total matches)"""
+        query_words = self._word_trigrams(query)
+        if not query_words:
+            return [], 0
+        query_grams = set().union(*query_words)
+        with self._lock:
+            shared = Counter()
+            budget = self.max_postings
+            postings_lists = sorted((self._postings.get(gram, ()) for gram in query_grams), key=len)
+            for postings in postings_lists:
+                if len(postings) > budget:
+                    self.truncated_queries += 1
+                    if len(shared) >= self.max_candidates:
+                        # Rarer trigrams already found enough candidates
+                        break
+                    postings = itertools.islice(postings, budget)
+                    budget = 0
+                else:
+                    budget -= len(postings)
+                shared.update(postings)
+                if budget <= 0:
+                    break
+            self.postings_visited += self.max_postings - budget
+            if category:
+                shared = Counter({doc: n for doc, n in shared.items() if self._doc_category.get(doc) == category})
+            candidates = heapq.nlargest(self.max_candidates, shared.items(), key=lambda item: (item[1], item[0]))
+
+            scores = []
+            for doc, _ in candidates:
+                title_words = self._doc_words[doc]
+                # Each query word counts with its best-matching title word
+                score = sum(
+                    max(trigram_similarity(q, w) for w in title_words) for q in query_words
+                ) / len(query_words)
+                if score >= self.min_similarity:
+                    scores.append((doc, score))
+
+        scores.sort(key=lambda item: (item[1], item[0]), reverse=True)
+        return scores[offset:offset + limit], len(scores)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._doc_words),
+                "trigrams": len(self._postings),
+                "max_candidates": self.max_candidates,
+                "max_postings": self.max_postings,
+                "postings_visited": self.postings_visited,
+                "truncated_queries": self.truncated_queries,
+            }
+
+
+listing_index = ListingSearchIndex()
+listing_trigrams = TrigramIndex()
@@ -0,0 +1,115 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+
+SPACE_RE = re.compile(r"\s+")
+SCAN_LIMIT = 2000
+
+
+def normalize(text):
+    if not text:
+        return ""
+    return SPACE_RE.sub(" ", text.lower()).strip()
+
+
+class TitleSuggester:
+    """Prefix lookup over active listing titles, backed by a sorted array and bisect
+
+    Every word boundary of a title gets its own key ("apple iphone 12",
+    "iphone 12", "12") so a prefix matches mid-title words too. Like the
+    search index, each process keeps its own copy, built at startup and
+    updated by this process's listing writes.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._lock = threading.Lock()
+        self._keys = []
+        self._listings = {}
+
+    def _title_keys(self, listing_id, title):
+        words = normalize(title).split(" ")
+        return [(" ".join(words[i:]), listing_id) for i in range(len(words)) if words[i]]
+
+    def _entry(self, listing):
+        created_at = listing.get('created_at')
+        recency = created_at.timestamp() if hasattr(created_at, 'timestamp') else 0.0
+        return (listing['title'], listing.get('category'), (listing.get('views') or 0, recency))
+
+    def add(self, listing):
+        """Add (or refresh) one listing dict with id, title, category, views, created_at"""
+        listing_id = listing['id']
+        entry = self._entry(listing)
+        with self._lock:
+            previous = self._listings.get(listing_id)
+            if previous is None or previous[0] != entry[0]:
+                if previous is not None:
+                    self._remove_keys(listing_id, previous[0])
+                for key in self._title_keys(listing_id, entry[0]):
+                    insort(self._keys, key)
+            self._listings[listing_id] = entry
+
+    def remove(self, listing_id):
+        with self._lock:
+            previous = self._listings.pop(listing_id, None)
+            if previous is not None:
+                self._remove_keys(listing_id, previous[0])
+
+    def _remove_keys(self, listing_id, title):
+        for key in self._title_keys(listing_id, title):
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def rebuild(self, listings):
+        keys = []
+        entries = {}
+        for listing in listings:
+            entries[listing['id']] = self._entry(listing)
+            keys.extend(self._title_keys(listing['id'], listing['title']))
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._listings = entries
+            self.ready = True
+
+    def suggest(self, prefix, limit=8):
+        """Up to limit distinct titles with a word starting with prefix, most viewed then newest first
+
+        At most SCAN_LIMIT matching keys are considered, so very short
+        prefixes stay cheap at the cost of exact ranking.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        best = {}
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            end = min(len(self._keys), i + SCAN_LIMIT)
+            while i < end:
+                key, listing_id = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                title, category, weight = self._listings[listing_id]
+                dedupe = normalize(title)
+                if dedupe not in best or weight > best[dedupe][2]:
+                    best[dedupe] = (title, category, weight, listing_id)
+                i += 1
+        top = heapq.nlargest(limit, best.values(), key=lambda item: item[2])
+        return [
+            {"text": title, "category": category, "listing_id": listing_id}
+            for title, category, _, listing_id in top
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "listings": len(self._listings),
+                "keys": len(self._keys),
+            }
+
+
+listing_suggester = TitleSuggester()
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import mysql.connector
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('SECRET_KEY', 'unit-test-secret')
+
+from fake_mysql import FakeConnection  # noqa: E402
+
+# The app modules create their tables at import time; give them a connection that accepts anything
+mysql.connector.connect = lambda **config: FakeConnection()
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def mysql_conn(monkeypatch):
+    """A fresh fake connection behind a fresh pool, so each test sees only its own statements"""
+    conn = FakeConnection()
+    monkeypatch.setattr(mysql.connector, 'connect', lambda **config: conn)
+    monkeypatch.setattr(db, 'pool', db.ConnectionPool(db.DB_CONFIG, size=2, max_overflow=0, timeout=1))
+    return conn
+
+
+@pytest.fixture
+def client(mysql_conn):
+    """TestClient over the app, without running startup jobs, backed by mysql_conn"""
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def user(monkeypatch):
+    """A signed-in user, resolved from the user cache so auth issues no query"""
+    import auth
+    from cache import TTLCache
+    monkeypatch.setattr(auth, 'user_cache', TTLCache(maxsize=10, ttl=60))
+    user = {'id': 1, 'email': 'buyer@example.com', 'name': 'Buyer', 'created_at': '2024-01-01', 'is_active': True}
+    auth.user_cache.set(user['email'], user)
+    return user
+
+
+@pytest.fixture
+def auth_headers(user):
+    import datetime
+    import jwt
+    import auth
+    expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)
+    token = jwt.encode({'sub': user['email'], 'exp': expires}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,119 @@
+"""In-memory stand-in for a mysql.connector connection, enough to unit-test SQL paths without a server
+
+Statements are recorded with whitespace collapsed. Writes follow the
+connection's autocommit setting: they land in `committed` at once, or wait
+in `pending` until commit() (rollback() drops them). `results` maps a query
+fragment to the rows returned for it, and `failures` maps a fragment to the
+error raised when a matching statement runs.
+"""
+from mysql.connector import errors
+
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class FakeCursor:
+    def __init__(self, conn, dictionary=False, **kwargs):
+        self.conn = conn
+        self.dictionary = dictionary
+        self.lastrowid = None
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, query, params=None):
+        self._rows = self.conn._execute(' '.join(query.split()), params)
+        self.lastrowid = self.conn.lastrowid
+        self.rowcount = len(self._rows) or 1
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def column_names(self):
+        return tuple(self._rows[0]) if self._rows and isinstance(self._rows[0], dict) else ()
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, results=None, failures=None):
+        self.autocommit = True
+        self.results = dict(results or {})
+        self.failures = dict(failures or {})
+        self.statements = []
+        self.committed = []
+        self.pending = []
+        self.lastrowid = 0
+        self._explicit = False
+
+    @property
+    def in_transaction(self):
+        return self._explicit or bool(self.pending)
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self, **kwargs)
+
+    def _execute(self, query, params):
+        for fragment, error in self.failures.items():
+            if fragment in query:
+                raise error
+        self.statements.append((query, params))
+        if query.startswith(WRITE_PREFIXES):
+            self.lastrowid += 1
+            if self.autocommit and not self._explicit:
+                self.committed.append((query, params))
+            else:
+                self.pending.append((query, params))
+        for fragment, rows in self.results.items():
+            if fragment in query:
+                return [dict(row) if isinstance(row, dict) else row for row in rows]
+        return []
+
+    def writes(self, fragment):
+        """Committed statements containing fragment"""
+        return [query for query, _ in self.committed if fragment in query]
+
+    def executed(self, fragment):
+        return [(query, params) for query, params in self.statements if fragment in query]
+
+    def start_transaction(self, **kwargs):
+        self._explicit = True
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+        self._explicit = False
+
+    def rollback(self):
+        self.pending = []
+        self._explicit = False
+
+    def ping(self, **kwargs):
+        pass
+
+    def consume_results(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def foreign_key_error():
+    return errors.IntegrityError(
+        msg="Cannot add or update a child row: a foreign key constraint fails", errno=1452
+    )
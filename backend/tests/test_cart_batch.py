@@ -0,0 +1,88 @@
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from db import UnitOfWork
+from fake_mysql import foreign_key_error
+from main import CartOperation, apply_cart_operations, fold_cart_operations
+
+
+def ops(*specs):
+    return [CartOperation(op=op, product_id=product_id, quantity=quantity) for op, product_id, quantity in specs]
+
+
+def test_fold_sums_adds_to_one_listing():
+    assert fold_cart_operations(ops(('add', 1, 1), ('add', 1, 2))) == {1: ('add', 3)}
+
+
+def test_fold_update_replaces_earlier_adds_and_later_adds_build_on_it():
+    assert fold_cart_operations(ops(('add', 1, 1), ('update', 1, 4), ('add', 1, 2))) == {1: ('set', 6)}
+
+
+def test_fold_add_after_remove_sets_the_quantity():
+    assert fold_cart_operations(ops(('remove', 1, 1), ('add', 1, 2))) == {1: ('set', 2)}
+
+
+def test_fold_update_to_zero_removes():
+    assert fold_cart_operations(ops(('add', 1, 1), ('update', 1, 0))) == {1: ('remove', 0)}
+
+
+def test_fold_keeps_listings_apart():
+    assert fold_cart_operations(ops(('add', 1, 1), ('remove', 2, 1), ('update', 3, 5))) == {
+        1: ('add', 1), 2: ('remove', 0), 3: ('set', 5),
+    }
+
+
+@pytest.mark.parametrize("data", [
+    {'op': 'add', 'product_id': 1, 'quantity': -5},
+    {'op': 'add', 'product_id': 1, 'quantity': 0},
+    {'op': 'update', 'product_id': 1, 'quantity': -1},
+    {'op': 'bogus', 'product_id': 1},
+])
+def test_invalid_operations_are_rejected(data):
+    with pytest.raises(ValidationError):
+        CartOperation(**data)
+
+
+def test_batch_statements_commit_together(mysql_conn):
+    uow = UnitOfWork()
+    apply_cart_operations(uow, 1, ops(('remove', 2, 1), ('add', 1, 2), ('update', 3, 4)))
+    uow.close()
+    assert len(mysql_conn.writes('DELETE FROM cart_items')) == 1
+    assert len(mysql_conn.writes('ON DUPLICATE KEY UPDATE')) == 2
+
+
+def test_failed_upsert_rolls_back_the_whole_batch(mysql_conn):
+    mysql_conn.failures['ON DUPLICATE KEY UPDATE'] = foreign_key_error()
+    uow = UnitOfWork()
+    with pytest.raises(HTTPException):
+        apply_cart_operations(uow, 1, ops(('remove', 2, 1), ('add', 999, 1)))
+    uow.close()
+    assert mysql_conn.executed('DELETE FROM cart_items')
+    assert mysql_conn.committed == []
+
+
+def test_batch_endpoint_answers_unknown_listings_with_400(client, mysql_conn, auth_headers):
+    mysql_conn.failures['ON DUPLICATE KEY UPDATE'] = foreign_key_error()
+    response = client.post("/api/cart/batch", headers=auth_headers, json={'operations': [
+        {'op': 'remove', 'product_id': 2}, {'op': 'add', 'product_id': 999},
+    ]})
+    assert response.status_code == 400
+    assert mysql_conn.committed == []
+
+
+def test_batch_endpoint_rejects_negative_adds(client, auth_headers):
+    response = client.post("/api/cart/batch", headers=auth_headers, json={'operations': [
+        {'op': 'add', 'product_id': 1, 'quantity': -5},
+    ]})
+    assert response.status_code == 422
+
+
+def test_batch_endpoint_returns_the_final_cart(client, mysql_conn, auth_headers):
+    mysql_conn.results['COALESCE(SUM'] = [(10, 2)]
+    response = client.post("/api/cart/batch", headers=auth_headers, json={'operations': [
+        {'op': 'add', 'product_id': 1, 'quantity': 2},
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {'items': [], 'total': 10.0, 'items_count': 2}
+    assert mysql_conn.writes('ON DUPLICATE KEY UPDATE')
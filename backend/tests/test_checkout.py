@@ -0,0 +1,46 @@
+import pytest
+from fastapi import HTTPException
+
+from checkout import CheckoutRequest, _process_checkout
+from db import UnitOfWork
+from fake_mysql import foreign_key_error
+
+
+def checkout_request(item_count):
+    return CheckoutRequest(
+        order_items=[{'product_id': n, 'quantity': 2, 'price': 5.0} for n in range(1, item_count + 1)],
+        shipping_address={'firstName': 'A', 'lastName': 'B', 'email': 'a@example.com', 'phone': '1',
+                          'address': 'x', 'city': 'c', 'state': 's', 'zipCode': '1', 'country': 'IN'},
+        payment_info={'method': 'cod'},
+    )
+
+
+def test_checkout_writes_items_in_one_insert_and_commits_once(mysql_conn):
+    uow = UnitOfWork()
+    order = _process_checkout(uow, checkout_request(30), {'id': 1})
+    uow.close()
+    assert order.total_amount == 300.0
+    assert len(mysql_conn.writes('INSERT INTO orders')) == 1
+    (query, params), = mysql_conn.executed('INSERT INTO order_items')
+    assert query.count('(%s, %s, %s, %s, %s)') == 30
+    assert len(params) == 150
+    assert mysql_conn.writes('DELETE FROM cart_items')
+
+
+def test_failed_item_insert_leaves_no_order_behind(mysql_conn):
+    mysql_conn.failures['INSERT INTO order_items'] = foreign_key_error()
+    uow = UnitOfWork()
+    with pytest.raises(HTTPException) as exc:
+        _process_checkout(uow, checkout_request(3), {'id': 1})
+    uow.close()
+    assert exc.value.status_code == 400
+    assert mysql_conn.executed('INSERT INTO orders')
+    assert mysql_conn.writes('INSERT INTO orders') == []
+    assert mysql_conn.committed == []
+
+
+def test_empty_order_is_rejected_before_any_write(mysql_conn):
+    with pytest.raises(HTTPException) as exc:
+        _process_checkout(UnitOfWork(), checkout_request(0), {'id': 1})
+    assert exc.value.status_code == 400
+    assert mysql_conn.statements == []
@@ -0,0 +1,135 @@
+import gzip
+import types
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware
+from etag import etag_matches, not_modified
+
+
+PAGE = {'items': ['listing ' * 20] * 20}
+ETAG = '"page-v1"'
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get('/page')
+    async def page(request: Request):
+        if etag_matches(request, ETAG):
+            return not_modified(ETAG)
+        return JSONResponse(PAGE, headers={'ETag': ETAG, 'Vary': 'Origin'})
+
+    @app.get('/small')
+    async def small():
+        return {'ok': True}
+
+    @app.get('/stream')
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield b'row ' * 500
+        return StreamingResponse(chunks(), media_type='text/csv')
+
+    @app.get('/image')
+    async def image():
+        return Response(b'\x89PNG' * 1000, media_type='image/png')
+
+    @app.get('/encoded')
+    async def encoded():
+        return PlainTextResponse('x' * 2000, headers={'Content-Encoding': 'identity'})
+
+    return app
+
+
+@pytest.fixture
+def compressed_client():
+    return TestClient(CompressionMiddleware(build_app(), min_size=100))
+
+
+def get(client, path, accept_encoding, **headers):
+    return client.get(path, headers={'Accept-Encoding': accept_encoding, **headers})
+
+
+def test_gzip_body_headers_and_weak_etag(compressed_client):
+    response = get(compressed_client, '/page', 'gzip, deflate')
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json() == PAGE
+    assert response.headers['vary'] == 'Origin, Accept-Encoding'
+    assert response.headers['etag'] == 'W/' + ETAG
+
+
+def test_content_length_is_the_compressed_size(compressed_client):
+    with compressed_client.stream('GET', '/page', headers={'Accept-Encoding': 'gzip'}) as response:
+        raw = b''.join(response.iter_raw())
+    assert int(response.headers['content-length']) == len(raw)
+    assert gzip.decompress(raw) == JSONResponse(PAGE).body
+
+
+def test_brotli_is_preferred_when_available(compressed_client, monkeypatch):
+    fake = types.SimpleNamespace(compress=lambda body, quality: b'br:' + body)
+    monkeypatch.setattr(compression, 'brotli', fake)
+    with compressed_client.stream('GET', '/page', headers={'Accept-Encoding': 'gzip, br'}) as response:
+        raw = b''.join(response.iter_raw())
+    assert response.headers['content-encoding'] == 'br'
+    assert raw == b'br:' + JSONResponse(PAGE).body
+
+
+def test_brotli_is_not_offered_without_the_module(compressed_client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert get(compressed_client, '/page', 'br').headers.get('content-encoding') is None
+    assert get(compressed_client, '/page', 'br, gzip').headers['content-encoding'] == 'gzip'
+
+
+def test_codings_refused_with_q0_are_not_used(compressed_client):
+    response = get(compressed_client, '/page', 'gzip;q=0, identity')
+    assert 'content-encoding' not in response.headers
+    assert response.headers['etag'] == ETAG
+    assert get(compressed_client, '/page', 'gzip;q=0.5').headers['content-encoding'] == 'gzip'
+
+
+@pytest.mark.parametrize('path', ['/small', '/image', '/encoded'])
+def test_small_binary_and_encoded_bodies_pass_through(compressed_client, path):
+    response = get(compressed_client, path, 'gzip')
+    assert response.headers.get('content-encoding') in (None, 'identity')
+    assert 'vary' not in response.headers
+
+
+def test_streamed_responses_pass_through(compressed_client):
+    response = get(compressed_client, '/stream', 'gzip')
+    assert 'content-encoding' not in response.headers
+    assert response.content == b'row ' * 1500
+
+
+def test_304_revalidation_of_a_compressed_page(compressed_client):
+    first = get(compressed_client, '/page', 'gzip')
+    again = get(compressed_client, '/page', 'gzip', **{'If-None-Match': first.headers['etag']})
+    assert again.status_code == 304
+    assert again.content == b''
+    assert 'content-encoding' not in again.headers
+    assert again.headers['etag'] == first.headers['etag']
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    offloaded = []
+
+    async def to_thread(func, *args):
+        offloaded.append(args[1])
+        return func(*args)
+
+    monkeypatch.setattr(compression.asyncio, 'to_thread', to_thread)
+    client = TestClient(CompressionMiddleware(build_app(), min_size=100, offload_size=1000))
+    assert get(client, '/page', 'gzip').json() == PAGE
+    assert offloaded == ['gzip']
+    get(client, '/encoded', 'gzip')
+    assert offloaded == ['gzip']
+
+
+def test_304_answering_a_strong_tag_keeps_it_strong(compressed_client):
+    again = get(compressed_client, '/page', 'gzip', **{'If-None-Match': ETAG})
+    assert again.status_code == 304
+    assert again.headers['etag'] == ETAG
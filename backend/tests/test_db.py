@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import db
+from db import UnitOfWork
+
+
+def test_pooled_connection_forwards_settings_to_the_raw_connection(mysql_conn):
+    conn = db.get_db_connection()
+    conn.autocommit = False
+    assert mysql_conn.autocommit is False
+    assert 'autocommit' not in vars(conn)
+    conn.close()
+    assert mysql_conn.autocommit is True
+
+
+def test_unit_of_work_holds_the_raw_connection_out_of_autocommit(mysql_conn):
+    uow = UnitOfWork()
+    uow.cursor().execute("INSERT INTO cart_items (user_id, listing_id, quantity) VALUES (1, 2, 1)")
+    assert mysql_conn.autocommit is False
+    assert mysql_conn.committed == []
+    uow.commit()
+    assert len(mysql_conn.writes('INSERT INTO cart_items')) == 1
+    uow.close()
+    assert mysql_conn.autocommit is True
+
+
+def test_unit_of_work_rollback_discards_uncommitted_writes(mysql_conn):
+    uow = UnitOfWork()
+    uow.cursor().execute("DELETE FROM cart_items WHERE user_id = 1")
+    uow.rollback()
+    uow.close()
+    assert mysql_conn.committed == []
+
+
+def test_unit_of_work_close_rolls_back_what_was_not_committed(mysql_conn):
+    uow = UnitOfWork()
+    uow.cursor().execute("INSERT INTO orders (user_id) VALUES (1)")
+    uow.close()
+    assert mysql_conn.committed == []
+    assert not mysql_conn.in_transaction
+
+
+def test_unit_of_work_without_queries_borrows_nothing(mysql_conn):
+    uow = UnitOfWork()
+    uow.commit()
+    uow.close()
+    assert db.pool.stats()["checkouts"] == 0
+
+
+@pytest.mark.parametrize("name", ["_raw", "_released"])
+def test_pooled_connection_keeps_private_state_on_the_wrapper(mysql_conn, name):
+    conn = db.get_db_connection()
+    assert name in vars(conn)
+    conn.close()
+
+
+def test_requests_beyond_the_pool_limit_queue_instead_of_stalling_the_executor(mysql_conn, monkeypatch):
+    # Two connections, two DB threads, four requests that each hold their connection across awaits
+    monkeypatch.setattr(db, '_db_executor', ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(db, '_db_slots', None)
+
+    def query(uow):
+        uow.cursor().execute("SELECT 1")
+        time.sleep(0.01)
+
+    async def request():
+        uow = UnitOfWork()
+        try:
+            await db.run_db(query, uow)
+            await asyncio.sleep(0)
+            await db.run_db(query, uow)
+        finally:
+            await db.run_db(uow.close)
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(4)))
+
+    start = time.monotonic()
+    asyncio.run(main())
+    assert time.monotonic() - start < db.pool.timeout
+    stats = db.pool.stats()
+    assert stats["timeouts"] == 0
+    assert stats["checkouts"] == 4
+    assert stats["checked_out"] == 0
+
+
+def test_get_db_teardown_skips_the_executor_when_nothing_was_borrowed(monkeypatch):
+    calls = []
+
+    async def fake_run_db(func, *args, **kwargs):
+        calls.append(func)
+
+    monkeypatch.setattr(db, 'run_db', fake_run_db)
+
+    async def request():
+        dependency = db.get_db()
+        await dependency.__anext__()
+        with pytest.raises(StopAsyncIteration):
+            await dependency.__anext__()
+
+    asyncio.run(request())
+    assert calls == []
@@ -0,0 +1,77 @@
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware
+from etag import etag_matches, not_modified, version_etag
+
+
+CART_VERSION = 'BIT_XOR(CRC32'
+
+
+def request_with(if_none_match):
+    return Request({'type': 'http', 'headers': [(b'if-none-match', if_none_match.encode('latin-1'))]})
+
+
+def test_etag_matches_uses_weak_comparison():
+    etag = version_etag('cart', 1)
+    assert etag_matches(request_with(etag), etag)
+    assert etag_matches(request_with('W/' + etag), etag)
+    assert etag_matches(request_with(f'"other", W/{etag}'), etag)
+    assert etag_matches(request_with('*'), etag)
+    assert not etag_matches(request_with('"other"'), etag)
+    assert not etag_matches(Request({'type': 'http', 'headers': []}), etag)
+
+
+def test_version_etag_changes_with_any_part():
+    assert version_etag('cart', 1, '5') != version_etag('cart', 1, '6')
+
+
+def cart_version(checksum):
+    return [(2, 3, 7, '2024-01-01 10:00:00', '2024-01-01 09:00:00', '2024-01-01 08:00:00', checksum)]
+
+
+def test_cart_revalidation_answers_304_without_reading_the_cart(client, mysql_conn, auth_headers):
+    mysql_conn.results[CART_VERSION] = cart_version(1234)
+    mysql_conn.results['SUM(ci.quantity * l.price)'] = [(0, 0)]
+    first = client.get('/api/cart', headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers['etag']
+
+    mysql_conn.statements.clear()
+    again = client.get('/api/cart', headers={**auth_headers, 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['etag'] == etag
+    assert len(mysql_conn.statements) == 1
+
+
+def test_same_second_quantity_move_changes_the_cart_etag(client, mysql_conn, auth_headers):
+    # Count, sum and timestamps are unchanged; only the per-line checksum moves
+    mysql_conn.results[CART_VERSION] = cart_version(1234)
+    mysql_conn.results['SUM(ci.quantity * l.price)'] = [(0, 0)]
+    etag = client.get('/api/cart', headers=auth_headers).headers['etag']
+
+    mysql_conn.results[CART_VERSION] = cart_version(5678)
+    again = client.get('/api/cart', headers={**auth_headers, 'If-None-Match': etag})
+    assert again.status_code == 200
+    assert again.headers['etag'] != etag
+
+
+def test_weakened_etag_of_a_compressed_page_still_revalidates():
+    app = FastAPI()
+    etag = version_etag('page', 1)
+
+    @app.get('/page')
+    async def page(request: Request, response: Response):
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers['ETag'] = etag
+        return {'items': ['x' * 100] * 10}
+
+    client = TestClient(CompressionMiddleware(app, min_size=10))
+    first = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['content-encoding'] == 'gzip'
+    assert first.headers['etag'] == 'W/' + etag
+
+    again = client.get('/page', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['etag']})
+    assert again.status_code == 304
+    assert again.content == b''
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import db
+import export
+from db import UnitOfWork
+
+
+LISTING_ROWS = [{'id': 1, 'title': 'Lamp', 'images': '["a.jpg"]'}, {'id': 2, 'title': 'Desk', 'images': None}]
+
+
+@pytest.fixture(autouse=True)
+def fresh_export_slots(monkeypatch):
+    monkeypatch.setattr(export, '_export_slots', None)
+
+
+def test_listings_export_requires_auth(client):
+    assert client.get('/api/listings/export').status_code == 403
+
+
+def test_listings_export_streams_rows(client, mysql_conn, auth_headers):
+    mysql_conn.results['FROM listings l'] = LISTING_ROWS
+    response = client.get('/api/listings/export', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.text.splitlines() == ['{"id": 1, "title": "Lamp", "images": ["a.jpg"]}',
+                                          '{"id": 2, "title": "Desk", "images": []}']
+    assert db.pool.stats()['checked_out'] == 0
+
+
+def test_export_is_refused_while_the_export_slots_are_taken(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_MAX_CONCURRENT', 0)
+    response = client.get('/api/orders/sales/export', headers=auth_headers)
+    assert response.status_code == 503
+
+
+def test_request_connection_is_released_before_streaming(mysql_conn):
+    async def scenario():
+        uow = UnitOfWork()
+        await db.run_db(lambda work: work.cursor().execute("SELECT id FROM users"), uow)
+        response = await export.stream_export("SELECT id FROM orders", [], 'ndjson', 'orders', db=uow)
+        assert uow._conn is None
+        assert db.pool.stats()['checked_out'] == 0
+        await response.body_iterator.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_export_slot_and_connection_are_freed_when_the_client_goes_away(mysql_conn, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_BATCH_SIZE', 1)
+    monkeypatch.setattr(export, 'EXPORT_MAX_CONCURRENT', 1)
+    mysql_conn.results['FROM listings'] = LISTING_ROWS
+
+    async def scenario():
+        response = await export.stream_export("SELECT id FROM listings", [], 'ndjson', 'listings')
+        body = response.body_iterator
+        await body.__anext__()
+        assert export._export_semaphore().locked()
+        assert db.pool.stats()['checked_out'] == 1
+        await body.aclose()
+        assert not export._export_semaphore().locked()
+        assert db.pool.stats()['checked_out'] == 0
+        assert db.pool.stats()['invalidated'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_export_rejects_unknown_format():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(export.stream_export("SELECT 1", [], 'xml', 'x'))
+    assert exc.value.status_code == 400
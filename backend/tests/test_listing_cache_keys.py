@@ -0,0 +1,68 @@
+import pytest
+
+import dashboard
+from cache import TTLCache
+from db import UnitOfWork
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(dashboard, 'listing_count_cache', TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(dashboard, 'listing_response_cache', TTLCache(maxsize=100, ttl=60))
+
+
+def count_listings(mysql_conn, total, **filters):
+    mysql_conn.results['COUNT(*)'] = [{'total': total}]
+    uow = UnitOfWork()
+    try:
+        args = dict(category=None, search=None, limit=10, offset=0, search_mode='like', count_mode='cached')
+        args.update(filters)
+        return dashboard._get_all_listings(uow, **args)['total']
+    finally:
+        uow.close()
+
+
+def test_count_cache_keys_on_condition_alongside_search(mysql_conn):
+    assert count_listings(mysql_conn, 7, search='phone', condition='new') == 7
+    assert count_listings(mysql_conn, 3, search='phone', condition='used') == 3
+    assert len(mysql_conn.executed('SELECT COUNT(*)')) == 2
+
+
+def test_count_cache_reuses_a_total_for_the_same_filters(mysql_conn):
+    assert count_listings(mysql_conn, 7, search='phone', condition='new', min_price=10) == 7
+    assert count_listings(mysql_conn, 99, search='phone', condition='new', min_price=10) == 7
+    assert len(mysql_conn.executed('SELECT COUNT(*)')) == 1
+
+
+@pytest.mark.parametrize("first, second", [
+    ("condition=new", "condition=used"),
+    ("min_price=10", "min_price=20"),
+    ("sort=price_asc", "sort=price_desc"),
+    ("fields=card", "fields=title"),
+])
+def test_listing_pages_are_cached_per_filter(client, mysql_conn, first, second):
+    mysql_conn.results['COUNT(*)'] = [{'total': 0}]
+    assert client.get(f"/api/listings?search=phone&search_mode=like&{first}").headers["X-Cache"] == "MISS"
+    assert client.get(f"/api/listings?search=phone&search_mode=like&{second}").headers["X-Cache"] == "MISS"
+    assert client.get(f"/api/listings?search=phone&search_mode=like&{first}").headers["X-Cache"] == "HIT"
+
+
+def listings_query(mysql_conn):
+    query, _ = [entry for entry in mysql_conn.executed('FROM listings l') if 'COUNT(*)' not in entry[0]][-1]
+    return query
+
+
+def test_default_listing_page_does_not_send_the_first_image_twice(client, mysql_conn):
+    mysql_conn.results['COUNT(*)'] = [{'total': 0}]
+    assert client.get("/api/listings?category=Books").status_code == 200
+    query = listings_query(mysql_conn)
+    assert 'l.images' in query
+    assert 'primary_image' not in query
+
+
+def test_card_projection_sends_only_the_primary_image(client, mysql_conn):
+    mysql_conn.results['COUNT(*)'] = [{'total': 0}]
+    assert client.get("/api/listings?category=Garden&fields=card").status_code == 200
+    query = listings_query(mysql_conn)
+    assert 'l.primary_image' in query
+    assert 'l.images' not in query
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+
+import dashboard
+from db import UnitOfWork
+from facets import ListingFacets
+from search_index import ListingSearchIndex, TrigramIndex
+from suggest import TitleSuggester
+
+
+LISTING = {'id': 5, 'title': 'Vintage camera', 'description': 'Film camera', 'category': 'Electronics',
+           'condition_type': 'used', 'location': 'Pune', 'status': 'active', 'views': 3,
+           'created_at': datetime(2024, 1, 1)}
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    suggester, index, trigrams, facets = TitleSuggester(), ListingSearchIndex(), TrigramIndex(), ListingFacets()
+    for structure in (suggester, index, trigrams):
+        structure.rebuild([LISTING])
+    facets.rebuild([('Electronics', 'used', 1)])
+    monkeypatch.setattr(dashboard, 'listing_suggester', suggester)
+    monkeypatch.setattr(dashboard, 'listing_index', index)
+    monkeypatch.setattr(dashboard, 'listing_trigrams', trigrams)
+    monkeypatch.setattr(dashboard, 'listing_facets', facets)
+    return suggester, index, trigrams, facets
+
+
+def test_deleting_a_profile_drops_its_cascaded_listings_from_memory(mysql_conn, indexes):
+    suggester, index, trigrams, facets = indexes
+    page_key = ('Electronics',) + (None,) * 11
+    dashboard.listing_response_cache.set(page_key, (b'[]', '"etag"'))
+    mysql_conn.results['FROM listings WHERE user_id'] = [(5, 1, 'Electronics', 'used', 'active')]
+
+    uow = UnitOfWork()
+    dashboard._delete_profile(uow, {'id': 1, 'email': 'seller@example.com'})
+    uow.close()
+
+    assert mysql_conn.writes('DELETE FROM users')
+    assert suggester.suggest('vint') == []
+    assert index.search('camera')[1] == 0
+    assert trigrams.search('camera')[1] == 0
+    assert facets.snapshot()['total'] == 0
+    assert dashboard.listing_response_cache.get(page_key) is None
+
+
+def test_catch_up_applies_listings_written_by_other_workers(mysql_conn, indexes, monkeypatch):
+    suggester, index, trigrams, facets = indexes
+    for flag in ('LISTINGS_SEARCH_INDEX', 'LISTINGS_FUZZY_SEARCH', 'LISTINGS_SUGGEST'):
+        monkeypatch.setattr(dashboard, flag, True)
+    monkeypatch.setattr(dashboard, '_listing_index_watermark', datetime(2024, 1, 1))
+    imported = dict(LISTING, id=6, title='Oak bookshelf', description='Solid oak', updated_at=datetime(2024, 1, 3))
+    deactivated = dict(LISTING, status='sold', updated_at=datetime(2024, 1, 2))
+    mysql_conn.results['WHERE updated_at >='] = [imported, deactivated]
+
+    assert dashboard._catch_up_listing_indexes() == 2
+
+    assert [s['listing_id'] for s in suggester.suggest('oak')] == [6]
+    assert suggester.suggest('vint') == []
+    assert [listing_id for listing_id, _ in index.search('bookshelf')[0]] == [6]
+    assert index.search('camera')[1] == 0
+    assert trigrams.search('bookshelf')[1] == 1
+    assert dashboard._listing_index_watermark == datetime(2024, 1, 3)
+    assert mysql_conn.executed('WHERE updated_at >=')[0][1] == (datetime(2024, 1, 1),)
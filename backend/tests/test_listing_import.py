@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from listing_import import RowParser, aiter_lines
+
+
+def parse(fmt, lines):
+    parser = RowParser(fmt)
+    records = []
+    for line in lines:
+        records.extend(parser.feed(line))
+    return records + parser.close()
+
+
+def test_ndjson_rows_are_numbered_and_blank_lines_skipped():
+    records = parse('ndjson', ['{"title": "Lamp"}\n', '\n', '{"title": "Desk"}\n'])
+    assert records == [(1, {'title': 'Lamp'}, None), (2, {'title': 'Desk'}, None)]
+
+
+def test_ndjson_reports_bad_rows_without_stopping():
+    records = parse('ndjson', ['{oops\n', '[1, 2]\n', '{"title": "Desk"}\n'])
+    assert records[0][0] == 1 and records[0][2].startswith('Invalid JSON')
+    assert records[1] == (2, None, 'Row must be a JSON object')
+    assert records[2] == (3, {'title': 'Desk'}, None)
+
+
+def test_csv_uses_the_header_and_drops_empty_cells():
+    records = parse('csv', ['title,price,location\n', 'Lamp,12.5,\n'])
+    assert records == [(1, {'title': 'Lamp', 'price': '12.5'}, None)]
+
+
+def test_csv_record_may_span_lines_inside_quotes():
+    records = parse('csv', ['title,description\n', 'Lamp,"Brass,\n', 'barely used"\n', 'Desk,Oak\n'])
+    assert records == [
+        (1, {'title': 'Lamp', 'description': 'Brass,\nbarely used'}, None),
+        (2, {'title': 'Desk', 'description': 'Oak'}, None),
+    ]
+
+
+def test_csv_flushes_an_unterminated_last_record_on_close():
+    records = parse('csv', ['title,price\n', 'Lamp,12'])
+    assert records == [(1, {'title': 'Lamp', 'price': '12'}, None)]
+
+
+def test_csv_column_count_mismatch_is_a_row_error():
+    records = parse('csv', ['title,price\n', 'Lamp,12,extra\n'])
+    assert records == [(1, None, 'Expected 2 columns, got 3')]
+
+
+@pytest.mark.parametrize("cell, images", [
+    ('"[""a.jpg"", ""b.jpg""]"', ['a.jpg', 'b.jpg']),
+    ('a.jpg| b.jpg |', ['a.jpg', 'b.jpg']),
+])
+def test_csv_images_accept_a_json_array_or_pipes(cell, images):
+    records = parse('csv', ['title,images\n', f'Lamp,{cell}\n'])
+    assert records[0][1]['images'] == images
+
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError):
+        RowParser('xml')
+
+
+def test_aiter_lines_rejoins_lines_split_across_chunks():
+    async def chunks():
+        for chunk in (b'{"a": 1}\n{"b"', b': 2}\n{"c": 3}'):
+            yield chunk
+
+    async def collect():
+        return [line async for line in aiter_lines(chunks())]
+
+    assert asyncio.run(collect()) == ['{"a": 1}\n', '{"b": 2}\n', '{"c": 3}']
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from fake_mysql import FakeConnection
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, fetch_page
+
+
+def rows(count):
+    return [{'id': 100 - n, 'created_at': datetime(2024, 1, 1, 12, 0, 59 - n)} for n in range(count)]
+
+
+def test_fetch_page_without_limit_or_cursor_returns_every_row():
+    conn = FakeConnection(results={'FROM messages': rows(3)})
+    page, next_cursor = fetch_page(conn.cursor(), "SELECT * FROM messages m WHERE m.recipient_id = %s", [7], 'm')
+    assert len(page) == 3
+    assert next_cursor is None
+    query, params = conn.statements[-1]
+    assert query.endswith("ORDER BY m.created_at DESC, m.id DESC")
+    assert params == [7]
+
+
+def test_fetch_page_fetches_one_extra_row_to_find_the_next_page():
+    conn = FakeConnection(results={'FROM messages': rows(3)})
+    page, next_cursor = fetch_page(conn.cursor(), "SELECT * FROM messages m WHERE 1 = 1", [], 'm', limit=2)
+    assert [row['id'] for row in page] == [100, 99]
+    assert conn.statements[-1][1] == [3]
+    assert decode_cursor(next_cursor) == ('2024-01-01 12:00:58', 99)
+
+
+def test_fetch_page_last_page_has_no_cursor():
+    conn = FakeConnection(results={'FROM messages': rows(2)})
+    page, next_cursor = fetch_page(conn.cursor(), "SELECT * FROM messages m WHERE 1 = 1", [], 'm', limit=2)
+    assert len(page) == 2
+    assert next_cursor is None
+
+
+def test_fetch_page_seeks_past_the_cursor():
+    conn = FakeConnection()
+    after = encode_cursor(datetime(2024, 1, 1, 12, 0, 58), 99)
+    fetch_page(conn.cursor(), "SELECT * FROM orders o WHERE o.buyer_id = %s", [5], 'o', after=after)
+    query, params = conn.statements[-1]
+    assert "AND (o.created_at < %s OR (o.created_at = %s AND o.id < %s))" in query
+    assert params == [5, '2024-01-01 12:00:58', '2024-01-01 12:00:58', 99, 51]
+
+
+def test_fetch_page_clamps_the_page_size():
+    conn = FakeConnection()
+    fetch_page(conn.cursor(), "SELECT * FROM reviews r WHERE 1 = 1", [], 'r', limit=10 ** 6)
+    assert conn.statements[-1][1] == [MAX_PAGE_SIZE + 1]
+
+
+def test_malformed_cursor_is_a_400():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("query", [
+    "search=phone&search_mode=fulltext",
+    "search=phone&search_mode=boolean",
+])
+def test_listings_cursor_with_relevance_ranked_search_is_rejected(client, query):
+    cursor = encode_cursor(datetime(2024, 1, 1), 10)
+    response = client.get(f"/api/listings?{query}&cursor={cursor}")
+    assert response.status_code == 400
+    assert "relevance-ranked" in response.json()["detail"]
+
+
+def test_listings_cursor_with_search_sorted_newest_is_accepted(client, mysql_conn):
+    cursor = encode_cursor(datetime(2024, 1, 1), 10)
+    mysql_conn.results['COUNT(*)'] = [{'total': 0}]
+    response = client.get(f"/api/listings?search=phone&search_mode=fulltext&sort=newest&cursor={cursor}&count=exact")
+    assert response.status_code == 200
+    query, _ = mysql_conn.executed('ORDER BY l.created_at DESC, l.id DESC')[-1]
+    assert "l.created_at < %s" in query
+
+
+def test_paginate_with_an_empty_page_has_no_cursor():
+    from pagination import paginate
+    assert paginate(rows(1), 0) == ([], None)
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_PAGE_SIZE + 1])
+def test_listings_limit_out_of_range_is_a_422(client, limit):
+    assert client.get(f"/api/listings?limit={limit}").status_code == 422
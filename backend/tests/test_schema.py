@@ -0,0 +1,43 @@
+from mysql.connector import errors
+import pytest
+
+import dashboard
+from db import ensure_column, ensure_index
+from fake_mysql import FakeConnection
+
+
+def test_ensure_index_treats_a_concurrent_add_as_success():
+    conn = FakeConnection(failures={'ALTER TABLE': errors.ProgrammingError(msg="Duplicate key name", errno=1061)})
+    assert ensure_index(conn.cursor(), 'listings', 'idx_x', 'INDEX idx_x (id)') is False
+
+
+def test_ensure_column_treats_a_concurrent_add_as_success():
+    conn = FakeConnection(failures={'ALTER TABLE': errors.ProgrammingError(msg="Duplicate column", errno=1060)})
+    assert ensure_column(conn.cursor(), 'listings', 'primary_image', 'primary_image MEDIUMTEXT NULL') is False
+
+
+def test_ensure_index_still_raises_other_errors():
+    conn = FakeConnection(failures={'ALTER TABLE': errors.ProgrammingError(msg="No such table", errno=1146)})
+    with pytest.raises(errors.ProgrammingError):
+        ensure_index(conn.cursor(), 'listings', 'idx_x', 'INDEX idx_x (id)')
+
+
+def test_ensure_index_skips_existing_indexes():
+    conn = FakeConnection(results={'SHOW INDEX': [('listings', 'idx_x')]})
+    assert ensure_index(conn.cursor(), 'listings', 'idx_x', 'INDEX idx_x (id)') is False
+    assert conn.executed('ALTER TABLE') == []
+
+
+def test_migrate_adds_only_missing_indexes(mysql_conn):
+    present = {name for _, name, _ in dashboard.DASHBOARD_INDEXES[1:]}
+    real_execute = mysql_conn._execute
+
+    def execute(query, params):
+        if query.startswith('SHOW INDEX') and params[0] in present:
+            real_execute(query, params)
+            return [('row',)]
+        return real_execute(query, params)
+
+    mysql_conn._execute = execute
+    assert dashboard.migrate_dashboard_indexes() == ['ft_listings_search']
+    assert len(mysql_conn.executed('ALTER TABLE')) == 1
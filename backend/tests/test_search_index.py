@@ -0,0 +1,35 @@
+from search_index import TrigramIndex
+
+
+def catalog(index, common):
+    """common titles that share the query's frequent trigrams, plus one close match"""
+    listings = [{'id': n, 'title': f'phone case {n}', 'category': 'Electronics'} for n in range(common)]
+    listings.append({'id': 10 ** 6, 'title': 'iphone 12', 'category': 'Electronics'})
+    index.rebuild(listings)
+
+
+def test_trigram_search_visits_a_bounded_number_of_postings():
+    index = TrigramIndex(max_candidates=20, max_postings=500)
+    catalog(index, 5000)
+    ranked, _ = index.search('iphone')
+    assert ranked[0][0] == 10 ** 6
+    assert index.stats()['postings_visited'] <= 500
+    assert index.stats()['truncated_queries'] >= 1
+
+
+def test_trigram_search_with_a_large_budget_walks_every_posting():
+    index = TrigramIndex(max_candidates=20, max_postings=10 ** 6)
+    catalog(index, 50)
+    ranked, _ = index.search('iphnoe')
+    assert ranked[0][0] == 10 ** 6
+    assert index.stats()['truncated_queries'] == 0
+
+
+def test_trigram_search_tolerates_typos_and_filters_by_category():
+    index = TrigramIndex()
+    index.rebuild([
+        {'id': 1, 'title': 'Wooden bookshelf', 'category': 'Furniture'},
+        {'id': 2, 'title': 'Bookshelf speakers', 'category': 'Electronics'},
+    ])
+    assert {doc for doc, _ in index.search('bookshlef')[0]} == {1, 2}
+    assert [doc for doc, _ in index.search('bookshlef', category='Furniture')[0]] == [1]
@@ -0,0 +1,64 @@
+import pytest
+
+import dashboard
+from views import ViewCounter
+
+
+def test_views_of_unknown_listings_are_refused_once_ids_are_loaded():
+    views = ViewCounter(max_pending=10)
+    assert views.record(999)
+    views.drain()
+    views.set_listings([1, 2])
+    assert views.record(1)
+    assert not views.record(999)
+    assert views.drain() == {1: 1}
+    assert views.stats()["unknown"] == 1
+
+
+def test_bogus_ids_cannot_crowd_real_listings_out_of_the_buffer():
+    views = ViewCounter(max_pending=2)
+    views.set_listings([1, 2])
+    for listing_id in range(100, 200):
+        views.record(listing_id)
+    assert views.record(1)
+    assert views.record(2)
+
+
+def test_listing_writes_keep_the_viewable_set_current():
+    views = ViewCounter()
+    views.set_listings([])
+    views.add_listing(7)
+    assert views.record(7)
+    views.discard_listing(7)
+    assert not views.record(7)
+
+
+def test_repeat_views_from_one_client_count_once():
+    views = ViewCounter(dedupe_ttl=60)
+    views.set_listings([1])
+    assert views.record(1, client='10.0.0.1')
+    assert not views.record(1, client='10.0.0.1')
+    assert views.record(1, client='10.0.0.2')
+    assert views.drain() == {1: 2}
+    assert views.stats()["duplicates"] == 1
+
+
+def test_dedupe_can_be_disabled():
+    views = ViewCounter(dedupe_ttl=0)
+    assert views.record(1, client='10.0.0.1')
+    assert views.record(1, client='10.0.0.1')
+
+
+@pytest.fixture
+def views(monkeypatch):
+    counter = ViewCounter()
+    counter.set_listings([5])
+    monkeypatch.setattr(dashboard, 'listing_views', counter)
+    return counter
+
+
+def test_view_endpoint_counts_a_client_once_and_ignores_unknown_ids(client, views):
+    assert client.post("/api/listings/5/view").json()["accepted"] is True
+    assert client.post("/api/listings/5/view").json()["accepted"] is False
+    assert client.post("/api/listings/6/view").json()["accepted"] is False
+    assert views.drain() == {5: 1}
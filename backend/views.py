@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import Counter
+from cache import TTLCache
+
+
+LISTING_VIEWS_MAX_PENDING = int(os.getenv('LISTING_VIEWS_MAX_PENDING', 10000))
+# A client's repeat views of one listing within this many seconds count once (0 disables)
+LISTING_VIEWS_DEDUPE_TTL = float(os.getenv('LISTING_VIEWS_DEDUPE_TTL', 60))
+LISTING_VIEWS_DEDUPE_SIZE = int(os.getenv('LISTING_VIEWS_DEDUPE_SIZE', 100000))
+
+
+class ViewCounter:
+    """In-process buffer of listing view increments, drained periodically into MySQL
+
+    Recording a view is a dict increment under a lock; the flusher turns
+    whatever accumulated into one batched UPDATE, so a popular listing
+    costs one row write per flush instead of one per page view.
+
+    Once the set of active listing ids is loaded, views of other ids are
+    refused, so made-up ids cannot fill the buffer. Repeat views of a
+    listing by the same client within dedupe_ttl seconds count once.
+    """
+
+    def __init__(self, max_pending=10000, dedupe_ttl=60.0, dedupe_size=100000):
+        self.max_pending = max_pending
+        self.dedupe_ttl = dedupe_ttl
+        self.ready = False
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._listings = set()
+        self._recent = TTLCache(maxsize=dedupe_size, ttl=dedupe_ttl)
+        self.recorded = 0
+        self.dropped = 0
+        self.unknown = 0
+        self.duplicates = 0
+        self.flushed = 0
+        self.flushes = 0
+
+    def set_listings(self, listing_ids):
+        """Replace the set of listing ids that can be viewed (the active ones)"""
+        listing_ids = set(listing_ids)
+        with self._lock:
+            self._listings = listing_ids
+            self.ready = True
+
+    def add_listing(self, listing_id):
+        with self._lock:
+            self._listings.add(listing_id)
+
+    def discard_listing(self, listing_id):
+        with self._lock:
+            self._listings.discard(listing_id)
+
+    def record(self, listing_id, count=1, client=None):
+        """Buffer count views; returns False for unknown listings, repeats and a full buffer"""
+        with self._lock:
+            if self.ready and listing_id not in self._listings:
+                self.unknown += count
+                return False
+        if client is not None and self.dedupe_ttl > 0:
+            if self._recent.get((client, listing_id)) is not None:
+                with self._lock:
+                    self.duplicates += count
+                return False
+            self._recent.set((client, listing_id), True)
+        with self._lock:
+            if listing_id not in self._pending and len(self._pending) >= self.max_pending:
+                self.dropped += count
+                return False
+            self._pending[listing_id] += count
+            self.recorded += count
+            return True
+
+    def drain(self):
+        """Take every buffered delta, leaving the buffer empty"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        return pending
+
+    def restore(self, deltas):
+        """Put back deltas whose flush failed so they go out with the next one"""
+        with self._lock:
+            self._pending.update(deltas)
+
+    def mark_flushed(self, deltas):
+        with self._lock:
+            self.flushed += sum(deltas.values())
+            self.flushes += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_listings": len(self._pending),
+                "pending_views": sum(self._pending.values()),
+                "max_pending": self.max_pending,
+                "known_listings": len(self._listings) if self.ready else None,
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "unknown": self.unknown,
+                "duplicates": self.duplicates,
+                "flushes": self.flushes,
+            }
+
+
+listing_views = ViewCounter(LISTING_VIEWS_MAX_PENDING, LISTING_VIEWS_DEDUPE_TTL, LISTING_VIEWS_DEDUPE_SIZE)
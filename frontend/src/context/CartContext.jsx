@@ -13,6 +13,17 @@ export const CartProvider = ({ children }) => {
   const cartTotal = cartItems.reduce((total, item) => total + (item.price * item.quantity), 0);
   const cartItemsCount = cartItems.reduce((count, item) => count + item.quantity, 0);
 
+  // Merge a lean mutation response (one changed line) into the local cart
+  const applyCartDelta = useCallback((data) => {
+    setCartItems(items => {
+      const rest = items.filter(item => item.product_id !== data.product_id);
+      if (!data.item) return rest;
+      const index = items.findIndex(item => item.product_id === data.product_id);
+      if (index === -1) return [data.item, ...rest];
+      return items.map(item => (item.product_id === data.product_id ? data.item : item));
+    });
+  }, []);
+
   // Fetch cart items from API
   const fetchCartItems = useCallback(async () => {
     if (!isAuthenticated || !token) {
@@ -55,7 +66,7 @@ export const CartProvider = ({ children }) => {
       setLoading(true);
       setError(null);
 
-      const response = await fetch('http://localhost:8000/api/cart/add', {
+      const response = await fetch('http://localhost:8000/api/cart/add?lean=true', {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -68,8 +79,7 @@ export const CartProvider = ({ children }) => {
       });
 
       if (response.ok) {
-        const data = await response.json();
-        setCartItems(data.items || []);
+        applyCartDelta(await response.json());
         return { success: true, message: 'Item added to cart successfully' };
       } else {
         const errorData = await response.json();
@@ -82,7 +92,7 @@ export const CartProvider = ({ children }) => {
     } finally {
       setLoading(false);
     }
-  }, [isAuthenticated, token]);
+  }, [isAuthenticated, token, applyCartDelta]);
 
   // Update item quantity in cart
   const updateCartItem = useCallback(async (productId, quantity) => {
@@ -98,7 +108,7 @@ export const CartProvider = ({ children }) => {
       setLoading(true);
       setError(null);
 
-      const response = await fetch('http://localhost:8000/api/cart/update', {
+      const response = await fetch('http://localhost:8000/api/cart/update?lean=true', {
         method: 'PUT',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -111,8 +121,7 @@ export const CartProvider = ({ children }) => {
       });
 
       if (response.ok) {
-        const data = await response.json();
-        setCartItems(data.items || []);
+        applyCartDelta(await response.json());
         return { success: true, message: 'Cart updated successfully' };
       } else {
         const errorData = await response.json();
@@ -125,7 +134,7 @@ export const CartProvider = ({ children }) => {
     } finally {
       setLoading(false);
     }
-  }, [isAuthenticated, token]);
+  }, [isAuthenticated, token, applyCartDelta]);
 
   // Remove item from cart
   const removeFromCart = useCallback(async (productId) => {
@@ -137,7 +146,7 @@ export const CartProvider = ({ children }) => {
       setLoading(true);
       setError(null);
 
-      const response = await fetch('http://localhost:8000/api/cart/remove', {
+      const response = await fetch('http://localhost:8000/api/cart/remove?lean=true', {
         method: 'DELETE',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -149,8 +158,7 @@ export const CartProvider = ({ children }) => {
       });
 
       if (response.ok) {
-        const data = await response.json();
-        setCartItems(data.items || []);
+        applyCartDelta(await response.json());
         return { success: true, message: 'Item removed from cart successfully' };
       } else {
         const errorData = await response.json();
@@ -163,6 +171,42 @@ export const CartProvider = ({ children }) => {
     } finally {
       setLoading(false);
     }
+  }, [isAuthenticated, token, applyCartDelta]);
+
+  // Apply several add/update/remove operations in one request, e.g. [{ op: 'update', product_id, quantity }]
+  const applyCartBatch = useCallback(async (operations) => {
+    if (!isAuthenticated || !token) {
+      throw new Error('Please login to update cart');
+    }
+
+    try {
+      setLoading(true);
+      setError(null);
+
+      const response = await fetch('http://localhost:8000/api/cart/batch', {
+        method: 'POST',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ operations }),
+      });
+
+      if (response.ok) {
+        const data = await response.json();
+        setCartItems(data.items || []);
+        return { success: true, message: 'Cart updated successfully' };
+      } else {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || 'Failed to update cart');
+      }
+    } catch (err) {
+      console.error('Error applying cart operations:', err);
+      setError(err.message);
+      return { success: false, message: err.message };
+    } finally {
+      setLoading(false);
+    }
   }, [isAuthenticated, token]);
 
   // Clear entire cart
@@ -228,6 +272,7 @@ export const CartProvider = ({ children }) => {
     addToCart,
     updateCartItem,
     removeFromCart,
+    applyCartBatch,
     clearCart,
     isInCart,
     getItemQuantity,
@@ -17,6 +17,8 @@ const Shop = () => {
   const [error, setError] = useState('');
   const [selectedCategory, setSelectedCategory] = useState('All');
   const [searchQuery, setSearchQuery] = useState('');
+  const [searchInput, setSearchInput] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const [currentPage, setCurrentPage] = useState(1);
   const [totalPages, setTotalPages] = useState(1);
   const [totalListings, setTotalListings] = useState(0);
@@ -80,6 +82,7 @@ const Shop = () => {
     setSelectedListing(listing);
     setSelectedImageIndex(0);
     setShowDetailsModal(true);
+    fetch(`http://localhost:8000/api/listings/${listing.id}/view`, { method: 'POST' }).catch(() => {});
   };
 
  
@@ -177,10 +180,26 @@ const Shop = () => {
   }, [selectedCategory, searchQuery, currentPage]);
 
   
+  // Typeahead hits the in-memory suggest endpoint; the full search only runs on submit
+  useEffect(() => {
+    const prefix = searchInput.trim();
+    if (prefix.length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    fetch(`http://localhost:8000/api/listings/suggest?${new URLSearchParams({ q: prefix })}`, { signal: controller.signal })
+      .then((response) => (response.ok ? response.json() : { suggestions: [] }))
+      .then((data) => setSuggestions(data.suggestions || []))
+      .catch(() => {});
+    return () => controller.abort();
+  }, [searchInput]);
+
+  
   const handleSearch = (e) => {
     e.preventDefault();
     setCurrentPage(1);
-    fetchListings(selectedCategory, searchQuery, 1);
+    setSearchQuery(searchInput.trim());
   };
 
   
@@ -328,10 +347,16 @@ const Shop = () => {
                 <input
                   type="text"
                   placeholder="Search by title, description, or location..."
-                  value={searchQuery}
-                  onChange={(e) => setSearchQuery(e.target.value)}
+                  value={searchInput}
+                  onChange={(e) => setSearchInput(e.target.value)}
                   className="search-input"
+                  list="search-suggestions"
                 />
+                <datalist id="search-suggestions">
+                  {suggestions.map((suggestion) => (
+                    <option key={suggestion.listing_id} value={suggestion.text} />
+                  ))}
+                </datalist>
                 <button 
                   type="submit"
                   className="search-button"
@@ -383,6 +408,7 @@ const Shop = () => {
               <button 
                 onClick={() => {
                   setSearchQuery('');
+                  setSearchInput('');
                   setSelectedCategory('All');
                   setSearchParams({});
                 }}
@@ -402,9 +428,9 @@ const Shop = () => {
                     <div key={listing.id} className="product-card">
                   {/* Listing Image */}
                   <div className="product-image-container">
-                    {getFirstImage(listing.images) ? (
+                    {listing.primary_image || getFirstImage(listing.images) ? (
                       <img
-                        src={getFirstImage(listing.images)}
+                        src={listing.primary_image || getFirstImage(listing.images)}
                         alt={listing.title}
                         className="product-image"
                         onError={(e) => {